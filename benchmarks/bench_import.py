@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# file: benchmarks/bench_import.py
+
+"""
+Startup time benchmark and import regression guard.
+
+Runs each command-line path in a fresh interpreter several times and reports
+the median wall time. The light paths (--help, --version, --check-config,
+--dry-run and a bare `import make_gist_list`) are also run under
+`python -X importtime` and must not import the network stack; the benchmark
+exits with status 1 if one of them does, or if a light path is slower than
+--max-ms. No network access is needed.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 10] [--max-ms 150]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that only a real run needs
+HEAVY_MODULES = {"requests", "urllib3", "charset_normalizer", "idna", "certifi", "dotenv", "sqlite3"}
+
+LIGHT_CASES = {
+    "import make_gist_list": ["-c", "import make_gist_list"],
+    "--help": ["-m", "make_gist_list", "--help"],
+    "--version": ["-m", "make_gist_list", "--version"],
+    "--check-config": ["-m", "make_gist_list", "--check-config"],
+    "--dry-run": ["-m", "make_gist_list", "--dry-run"],
+}
+# For comparison: what every invocation used to pay
+FULL_CASES = {
+    "import core (full run)": ["-c", "import make_gist_list.core"],
+}
+
+
+def bench_env() -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k not in ("BATCH_CONFIG", "VERBOSE")}
+    env.update({
+        "PYTHONPATH": str(ROOT),
+        "GITHUB_USERNAME": "bench",
+        "LIST_GIST_ID": "target",
+        "GIST_TOKEN": "bench-token",
+        "TIMEZONE": "UTC",
+    })
+    return env
+
+
+def median_ms(args: List[str], env: Dict[str, str], cwd: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def imported_modules(args: List[str], env: Dict[str, str], cwd: str) -> Set[str]:
+    """Top-level names of every module imported by a run, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], env=env, cwd=cwd,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    names = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            names.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return names
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Startup time benchmark and import regression guard.")
+    parser.add_argument("--runs", type=int, default=10, help="runs per case (median is reported)")
+    parser.add_argument("--max-ms", type=float, default=0.0,
+                        help="fail if a light path's median exceeds this many milliseconds (0 = no limit)")
+    args = parser.parse_args()
+
+    env = bench_env()
+    failures = []
+    # An empty working directory, so no .env file is picked up (-m runs don't search the checkout)
+    with tempfile.TemporaryDirectory() as cwd:
+        baseline = median_ms(["-c", "pass"], env, cwd, args.runs)
+        # Some environments import a few of these at interpreter startup (site hooks)
+        preloaded = imported_modules(["-c", "pass"], env, cwd)
+        print(f"{'case':<24} {'median ms':>10} {'over python':>12}  heavy imports")
+        print(f"{'python -c pass':<24} {baseline:>10.1f} {0.0:>12.1f}")
+        for label, case_args in {**LIGHT_CASES, **FULL_CASES}.items():
+            ms = median_ms(case_args, env, cwd, args.runs)
+            heavy = sorted((imported_modules(case_args, env, cwd) - preloaded) & HEAVY_MODULES)
+            print(f"{label:<24} {ms:>10.1f} {ms - baseline:>12.1f}  {', '.join(heavy) or '-'}")
+            if label in LIGHT_CASES:
+                if heavy:
+                    failures.append(f"{label} imports {', '.join(heavy)}")
+                if args.max_ms and ms > args.max_ms:
+                    failures.append(f"{label} took {ms:.1f} ms (limit {args.max_ms:.1f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# file: benchmarks/bench_listing_decode.py
+
+"""
+Listing page decode benchmark.
+
+Builds REST listing pages like /users/{user}/gists returns them (owner object,
+full `files` map) with the mock server's payloads and compares two ways of
+turning a page into GistRecords:
+
+  r.json()     decode the whole page into Python objects, then project each gist
+  streamed     iter_json_array() over 64 KB chunks, projecting each gist as soon
+               as it is decoded (what list_public_gists() does)
+
+Reports the median decode time per page and the tracemalloc peak while decoding
+one page. --files makes every gist carry that many files, to show how both paths
+scale with large `files` maps. No network access is needed.
+
+Usage:
+    python benchmarks/bench_listing_decode.py [--per-page 100] [--files 0] [--runs 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Iterator, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_github import MockGitHub  # noqa: E402
+from make_gist_list import core  # noqa: E402
+
+
+def listing_page(per_page: int, files: int) -> bytes:
+    """One listing page as GitHub serializes it."""
+    mock = MockGitHub(gists=per_page)
+    page = []
+    for i in range(per_page):
+        gist = mock.rest_gist(i)
+        if files:
+            gist["files"] = {
+                f"file_{i}_{j}.txt": {
+                    "filename": f"file_{i}_{j}.txt",
+                    "type": "text/plain",
+                    "language": "Text",
+                    "raw_url": f"https://gist.githubusercontent.com/{mock.username}/{mock.gist_id(i)}/raw/file_{i}_{j}.txt",
+                    "size": 100 + j,
+                }
+                for j in range(files)
+            }
+        page.append(gist)
+    return json.dumps(page).encode("utf-8")
+
+
+def chunks(body: bytes, size: int = core.LISTING_CHUNK_SIZE) -> Iterator[bytes]:
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def decode_full(body: bytes) -> List[Any]:
+    # What Response.json() does: decode the whole body, then parse it in one go
+    return [core.GistRecord.from_rest(g) for g in json.loads(body.decode("utf-8"))]
+
+
+def decode_streamed(body: bytes) -> List[Any]:
+    return [core.GistRecord.from_rest(g) for g in core.iter_json_array(chunks(body))]
+
+
+def median_ms(fn: Callable[[bytes], List[Any]], body: bytes, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(body)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def peak_kb(fn: Callable[[bytes], List[Any]], body: bytes) -> float:
+    """Peak memory allocated while decoding one page, not counting the body itself."""
+    tracemalloc.start()
+    try:
+        fn(body)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--per-page", type=int, default=100, help="gists per page (GitHub's maximum is 100)")
+    parser.add_argument("--files", type=int, default=0, help="files per gist (0 = the mock's 1-4)")
+    parser.add_argument("--runs", type=int, default=20, help="runs per path (median is reported)")
+    args = parser.parse_args()
+
+    body = listing_page(args.per_page, args.files)
+    if decode_full(body) != decode_streamed(body):
+        print("FAIL: the two paths produced different records", file=sys.stderr)
+        return 1
+    print(f"{args.per_page} gists per page, {len(body) / 1024:.0f} KB body")
+    print(f"{'path':<10} {'median ms':>10} {'peak KB':>10}")
+    results = {}
+    for label, fn in (("r.json()", decode_full), ("streamed", decode_streamed)):
+        results[label] = (median_ms(fn, body, args.runs), peak_kb(fn, body))
+        print(f"{label:<10} {results[label][0]:>10.2f} {results[label][1]:>10.0f}")
+    full, streamed = results["r.json()"], results["streamed"]
+    print(f"streamed: {streamed[0] / full[0]:.2f}x the decode time, {full[1] / streamed[1]:.1f}x lower peak memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
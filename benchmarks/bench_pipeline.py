@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# file: benchmarks/bench_pipeline.py
+
+"""
+End-to-end pipeline benchmark against the local mock GitHub API.
+
+For each gist count, starts benchmarks/mock_github.py in-process, runs the full
+make-gist-list.py main() in a child process pointed at it (listing, enrichment,
+rendering and publishing to a mock target gist), and reports:
+
+    wall time, request count, bytes sent/received by the server, peak RSS of the run
+
+No real GitHub API calls are made and no quota is used.
+
+Usage:
+    python benchmarks/bench_pipeline.py                       # 10, 1k and 10k gists
+    python benchmarks/bench_pipeline.py --sizes 10 1000 --latency 0.02
+    python benchmarks/bench_pipeline.py --env FETCH_MODE=graphql --json results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from mock_github import MockGitHub, start_server  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "make-gist-list.py"
+
+
+def run_once(gists: int, latency: float, extra_env: Dict[str, str]) -> Dict[str, Any]:
+    # Only the node IDs from the listing resolve, so a run that builds legacy IDs
+    # shows up as REST fallback calls instead of passing unnoticed
+    mock = MockGitHub(gists=gists, latency=latency, legacy_node_ids=False)
+    server = start_server(mock)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "GITHUB_API_URL": base,
+                "GITHUB_GRAPHQL_URL": f"{base}/graphql",
+                "GITHUB_USERNAME": mock.username,
+                "GIST_TOKEN": "mock-token",
+                "LIST_GIST_ID": mock.target_gist_id,
+                "OUTPUT_FILE": os.path.join(tmp, "out.md"),
+                "HTTP_CACHE": "false",
+                "STATE_DB": "",
+                "BATCH_CONFIG": "",
+                **extra_env,
+            }
+            started = time.perf_counter()
+            proc = subprocess.Popen([sys.executable, str(SCRIPT)], env=env, cwd=tmp,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            # wait4 gives the resource usage of this child only
+            stderr = proc.stderr.read() if proc.stderr else b""
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            wall = time.perf_counter() - started
+            out_bytes = os.path.getsize(env["OUTPUT_FILE"]) if os.path.exists(env["OUTPUT_FILE"]) else 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    totals = mock.totals()
+    result = {
+        "gists": gists,
+        "latency": latency,
+        "exit_code": proc.returncode,
+        "wall_seconds": round(wall, 3),
+        "requests": totals["requests"],
+        "bytes_received": totals["bytes_in"],
+        "bytes_sent": totals["bytes_out"],
+        "peak_rss_bytes": peak_rss,
+        "output_bytes": out_bytes,
+        "by_endpoint": mock.stats,
+    }
+    if proc.returncode not in (0,):
+        result["stderr_tail"] = stderr.decode("utf-8", "replace")[-2000:]
+    return result
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'gists':>7} {'exit':>4} {'wall s':>8} {'requests':>9} {'sent MB':>9} {'recv KB':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['gists']:>7} {r['exit_code']:>4} {r['wall_seconds']:>8.2f} {r['requests']:>9} "
+              f"{r['bytes_sent'] / 1e6:>9.2f} {r['bytes_received'] / 1e3:>9.1f} {r['peak_rss_bytes'] / 2**20:>12.1f}")
+        if "stderr_tail" in r:
+            print(r["stderr_tail"], file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline against a mock GitHub API.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000], help="gist counts to run")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every mock request")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the run (e.g. FETCH_MODE=graphql); repeatable")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    results = [run_once(n, args.latency, extra_env) for n in args.sizes]
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"env": extra_env, "results": results}, f, indent=2)
+    return 0 if all(r["exit_code"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# file: benchmarks/bench_row_formatter.py
+
+"""
+Row formatter throughput benchmark.
+
+Renders synthetic gist records with RowFormatter and compares it with the
+previous per-row approach over raw API dicts, which rebuilt ZoneInfo(timezone) and the strftime
+pattern twice for every gist. No network access is needed.
+
+Usage:
+    python benchmarks/bench_row_formatter.py [--gists 100000] [--timezone America/New_York]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from zoneinfo import ZoneInfo
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_app() -> Any:
+    """Import the pipeline module from this checkout (no install needed)."""
+    sys.path.insert(0, str(ROOT))
+    from make_gist_list import core
+    return core
+
+
+def synthetic_gists(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    base = datetime(2015, 1, 1, tzinfo=dt_timezone.utc)
+    langs = ["Python", "Shell", "JavaScript", "Markdown", None]
+    gists = []
+    for i in range(n):
+        created = base + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+        updated = created + timedelta(seconds=rng.randrange(365 * 86400)) if rng.random() < 0.6 else created
+        files = {
+            f"file_{i}_{j}.txt": {"language": rng.choice(langs), "size": rng.randrange(1, 50000)}
+            for j in range(rng.randint(1, 5))
+        }
+        gists.append({
+            "id": f"{i:032x}",
+            "description": f"Synthetic gist {i}\nwith a second line of description text",
+            "public": True,
+            "created_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "updated_at": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "html_url": f"https://gist.github.com/bench/{i:032x}",
+            "files": files,
+            "engagement": {"comments": rng.randrange(10), "forks": rng.randrange(5), "stars": rng.randrange(50)},
+        })
+    return gists
+
+
+def naive_rows(app: Any, gists: List[Dict[str, Any]], tz_name: str, date_format: str, time_format: str) -> int:
+    """The per-row formatting the renderer used before RowFormatter existed."""
+    n = 0
+    for g in gists:
+        desc = (g.get("description") or "").strip() or "(no description)"
+        title = desc.splitlines()[0][:120]
+        files = g.get("files") or {}
+        file_names = list(files.keys())[:3]
+        if len(files) > 3:
+            file_names.append(f"+{len(files)-3} more")
+        file_names_str = ", ".join(file_names)
+        lang = app.primary_language(files)
+        stamps = []
+        for key in ("updated_at", "created_at"):
+            dt_utc = datetime.fromisoformat(g[key].replace("Z", "+00:00"))
+            dt_local = dt_utc.astimezone(ZoneInfo(tz_name))
+            date_strftime = date_format.replace("YYYY", "%Y").replace("MM", "%m").replace("DD", "%d")
+            time_strftime = "%I:%M %p" if time_format == "12" else "%H:%M"
+            stamps.append(dt_local.strftime(f"{date_strftime} {time_strftime} {dt_local.strftime('%Z')}"))
+        e = g["engagement"]
+        desc_truncated = desc[:50] + "..." if len(desc) > 50 else desc
+        _ = (f"| {title} | {desc_truncated} | {len(files)} | {file_names_str} | {lang or ''} | ✓ | {stamps[1]} | "
+             f"{stamps[0]} | [open]({g['html_url']}) | {e['comments']} | {e['forks']} | {e['stars']} |")
+        n += 1
+    return n
+
+
+def to_records(app: Any, gists: List[Dict[str, Any]]) -> List[Any]:
+    """Project the synthetic dicts into GistRecords, as list_public_gists() does."""
+    records = []
+    for g in gists:
+        record = app.GistRecord.from_rest(g)
+        record.engagement = g["engagement"]
+        records.append(record)
+    return records
+
+
+def formatter_rows(app: Any, records: List[Any], tz_name: str, date_format: str, time_format: str) -> int:
+    fmt = app.RowFormatter(tz_name, date_format, time_format, use_html_table=False)
+    n = 0
+    for g in records:
+        for _ in fmt.rows(g):
+            pass
+        n += 1
+    return n
+
+
+def bench(label: str, fn: Callable[[], int]) -> float:
+    started = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {rows:>8} rows  {elapsed:8.3f}s  {rows / elapsed:>10,.0f} rows/s")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gists", type=int, default=100_000)
+    parser.add_argument("--timezone", default="America/New_York")
+    parser.add_argument("--date-format", default="DD-MM-YYYY")
+    parser.add_argument("--time-format", default="12")
+    args = parser.parse_args()
+
+    app = load_app()
+    gists = synthetic_gists(args.gists)
+    params = (args.timezone, args.date_format, args.time_format)
+    print(f"{args.gists} synthetic gists, timezone={args.timezone}")
+    naive = bench("per-row (old)", lambda: naive_rows(app, gists, *params))
+    records = to_records(app, gists)
+    fast = bench("RowFormatter", lambda: formatter_rows(app, records, *params))
+    print(f"speedup: {naive / fast:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
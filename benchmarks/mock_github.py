@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# file: benchmarks/mock_github.py
+
+"""
+Local stand-in for the parts of the GitHub API that make-gist-list.py uses.
+
+Serves deterministic synthetic data for one user with a configurable number of
+gists, with optional per-request latency:
+
+    GET   /users/{user}/gists        paginated listing (per_page/page, Link headers)
+    GET   /gists/{id}/comments       per_page/page, Link headers
+    GET   /gists/{id}/forks          per_page/page, Link headers
+    GET   /gists/{id}                the target gist (content written by PATCH)
+    GET   /rate_limit                core and graphql budgets (free, like on GitHub)
+    PATCH /gists/{id}                update the target gist
+    POST  /graphql                   user(login).gists pages, aliased node(id:) lookups
+
+Gists carry current-style GraphQL node IDs ("G_<id>"). node(id:) also resolves
+the legacy base64 "04:Gist<id>" form unless `legacy_node_ids` is False, which
+simulates GitHub no longer accepting it.
+
+Every response carries X-RateLimit-* headers with a large budget, and GET
+responses carry an ETag so conditional requests get a 304. Request count and
+bytes in/out are tallied per endpoint class in `MockGitHub.stats`.
+
+Usage (standalone):
+    python benchmarks/mock_github.py --gists 1000 --latency 0.01 --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+RATE_LIMIT = 1_000_000
+
+
+class MockGitHub:
+    """Synthetic dataset plus request statistics, shared by all handler threads."""
+
+    def __init__(self, gists: int = 100, username: str = "bench", latency: float = 0.0,
+                 target_gist_id: str = "target", legacy_node_ids: bool = True) -> None:
+        self.n = gists
+        self.legacy_node_ids = legacy_node_ids
+        self.username = username
+        self.latency = latency
+        self.target_gist_id = target_gist_id
+        self.target: Dict[str, Any] = {
+            "id": target_gist_id,
+            "description": "",
+            "html_url": f"https://gist.github.com/{username}/{target_gist_id}",
+            "files": {},
+        }
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.reset_at = int(time.time()) + 3600
+        self.used = {"core": 0, "graphql": 0}
+
+    # Synthetic data -------------------------------------------------------
+
+    def gist_id(self, i: int) -> str:
+        return f"{i:032x}"
+
+    def node_id(self, i: int) -> str:
+        return f"G_{self.gist_id(i)}"
+
+    def resolve_node(self, node_id: str) -> Optional[int]:
+        """Gist index for a current-style or (if accepted) legacy node ID."""
+        if node_id.startswith("G_"):
+            return self.index_of(node_id[2:])
+        if not self.legacy_node_ids:
+            return None
+        try:
+            decoded = base64.b64decode(node_id, validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+        return self.index_of(decoded[len("04:Gist"):]) if decoded.startswith("04:Gist") else None
+
+    def index_of(self, gist_id: str) -> Optional[int]:
+        try:
+            i = int(gist_id, 16)
+        except ValueError:
+            return None
+        return i if 0 <= i < self.n else None
+
+    def counts(self, i: int) -> Tuple[int, int, int]:
+        """(comments, forks, stars) for gist i; a few gists are popular enough to paginate."""
+        if i % 97 == 0:
+            return 45 + i % 40, 35 + i % 20, 120 + i % 50
+        return i % 7, i % 3, i % 11
+
+    def timestamps(self, i: int) -> Tuple[str, str]:
+        created = 1_420_070_400 + i * 3_600 * 7
+        updated = created + (i % 13) * 86_400
+        fmt = "%Y-%m-%dT%H:%M:%SZ"
+        return time.strftime(fmt, time.gmtime(created)), time.strftime(fmt, time.gmtime(updated))
+
+    def files(self, i: int) -> Dict[str, Dict[str, Any]]:
+        langs = [("Python", ".py"), ("Shell", ".sh"), ("Markdown", ".md"), ("JavaScript", ".js")]
+        out = {}
+        for j in range(1 + i % 4):
+            lang, ext = langs[(i + j) % len(langs)]
+            name = f"snippet_{i}_{j}{ext}"
+            out[name] = {
+                "filename": name,
+                "type": "text/plain",
+                "language": lang,
+                "raw_url": f"https://gist.githubusercontent.com/{self.username}/{self.gist_id(i)}/raw/{name}",
+                "size": 200 + (i * 37 + j * 101) % 9000,
+            }
+        return out
+
+    def owner(self) -> Dict[str, Any]:
+        return {
+            "login": self.username,
+            "id": 1,
+            "node_id": "MDQ6VXNlcjE=",
+            "avatar_url": "https://avatars.githubusercontent.com/u/1?v=4",
+            "url": f"https://api.github.com/users/{self.username}",
+            "html_url": f"https://github.com/{self.username}",
+            "type": "User",
+            "site_admin": False,
+        }
+
+    def rest_gist(self, i: int) -> Dict[str, Any]:
+        gid = self.gist_id(i)
+        created, updated = self.timestamps(i)
+        comments, _, _ = self.counts(i)
+        return {
+            "url": f"https://api.github.com/gists/{gid}",
+            "forks_url": f"https://api.github.com/gists/{gid}/forks",
+            "commits_url": f"https://api.github.com/gists/{gid}/commits",
+            "id": gid,
+            "node_id": self.node_id(i),
+            "git_pull_url": f"https://gist.github.com/{gid}.git",
+            "git_push_url": f"https://gist.github.com/{gid}.git",
+            "html_url": f"https://gist.github.com/{self.username}/{gid}",
+            "files": self.files(i),
+            "public": True,
+            "created_at": created,
+            "updated_at": updated,
+            "description": f"Synthetic gist number {i}\nSecond line of the description for gist {i}.",
+            "comments": comments,
+            "user": None,
+            "comments_url": f"https://api.github.com/gists/{gid}/comments",
+            "owner": self.owner(),
+            "truncated": False,
+        }
+
+    def graphql_gist(self, i: int) -> Dict[str, Any]:
+        created, updated = self.timestamps(i)
+        comments, forks, stars = self.counts(i)
+        return {
+            "id": self.node_id(i),
+            "name": self.gist_id(i),
+            "description": f"Synthetic gist number {i}\nSecond line of the description for gist {i}.",
+            "isPublic": True,
+            "createdAt": created,
+            "updatedAt": updated,
+            "url": f"https://gist.github.com/{self.username}/{self.gist_id(i)}",
+            "stargazerCount": stars,
+            "comments": {"totalCount": comments},
+            "forks": {"totalCount": forks},
+            "files": [
+                {"name": name, "size": f["size"], "language": {"name": f["language"]}}
+                for name, f in self.files(i).items()
+            ],
+        }
+
+    def sorted_indexes(self) -> List[int]:
+        """Gist indexes newest-updated first, the order GitHub lists them in."""
+        return sorted(range(self.n), key=lambda i: self.timestamps(i)[1], reverse=True)
+
+    # Bookkeeping ----------------------------------------------------------
+
+    def record(self, endpoint: str, bytes_in: int, bytes_out: int) -> None:
+        with self.lock:
+            s = self.stats.setdefault(endpoint, {"requests": 0, "bytes_in": 0, "bytes_out": 0})
+            s["requests"] += 1
+            s["bytes_in"] += bytes_in
+            s["bytes_out"] += bytes_out
+
+    def totals(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                key: sum(s[key] for s in self.stats.values())
+                for key in ("requests", "bytes_in", "bytes_out")
+            }
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+    def rate_headers(self, resource: str, charge: bool = True) -> Dict[str, str]:
+        with self.lock:
+            if charge:
+                self.used[resource] += 1
+            remaining = max(0, RATE_LIMIT - self.used[resource])
+        return {
+            "X-RateLimit-Limit": str(RATE_LIMIT),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(self.reset_at),
+            "X-RateLimit-Resource": resource,
+        }
+
+    def rate_limit_status(self) -> Dict[str, Any]:
+        with self.lock:
+            resources = {
+                resource: {"limit": RATE_LIMIT, "used": used, "remaining": max(0, RATE_LIMIT - used),
+                           "reset": self.reset_at}
+                for resource, used in self.used.items()
+            }
+        return {"resources": resources, "rate": resources["core"]}
+
+
+def paginate(items_total: int, query: Dict[str, List[str]], default: int = 30) -> Tuple[int, int, int]:
+    per_page = min(100, max(1, int(query.get("per_page", [default])[0])))
+    page = max(1, int(query.get("page", ["1"])[0]))
+    last = max(1, -(-items_total // per_page))
+    return per_page, page, last
+
+
+def link_header(base: str, query: Dict[str, List[str]], page: int, last: int, per_page: int) -> Optional[str]:
+    extra = "".join(f"&{k}={v[0]}" for k, v in query.items() if k not in ("page", "per_page"))
+    links = []
+    if page < last:
+        links.append(f'<{base}?per_page={per_page}&page={page + 1}{extra}>; rel="next"')
+        links.append(f'<{base}?per_page={per_page}&page={last}{extra}>; rel="last"')
+    if page > 1:
+        links.append(f'<{base}?per_page={per_page}&page=1{extra}>; rel="first"')
+        links.append(f'<{base}?per_page={per_page}&page={page - 1}{extra}>; rel="prev"')
+    return ", ".join(links) or None
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "MockGitHub/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per request
+    disable_nagle_algorithm = True
+    mock: MockGitHub
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload: Any, endpoint: str, bytes_in: int, resource: str = "core",
+              extra: Optional[Dict[str, str]] = None, charge: bool = True) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8", **self.mock.rate_headers(resource, charge)}
+        if extra:
+            headers.update(extra)
+        if self.command == "GET" and status == 200:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        header_bytes = sum(len(k) + len(v) + 4 for k, v in headers.items())
+        self.mock.record(endpoint, bytes_in, len(body) + header_bytes)
+
+    def _delay(self) -> None:
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+
+    def do_GET(self) -> None:
+        self._delay()
+        m = self.mock
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        path = parts.path.rstrip("/")
+        bytes_in = len(self.requestline) + sum(len(k) + len(v) + 4 for k, v in self.headers.items())
+
+        match = re.fullmatch(r"/users/([^/]+)/gists", path)
+        if match:
+            if match.group(1) != m.username:
+                return self._send(404, {"message": "Not Found"}, "list", bytes_in)
+            order = m.sorted_indexes()
+            since = (query.get("since") or [None])[0]
+            if since:
+                order = [i for i in order if m.timestamps(i)[1] >= since]
+            per_page, page, last = paginate(len(order), query)
+            chunk = order[(page - 1) * per_page: page * per_page]
+            link = link_header(f"http://{self.headers.get('Host')}{path}", query, page, last, per_page)
+            return self._send(200, [m.rest_gist(i) for i in chunk], "list", bytes_in,
+                              extra={"Link": link} if link else None)
+
+        match = re.fullmatch(r"/gists/([0-9a-f]+)/(comments|forks)", path)
+        if match:
+            i = m.index_of(match.group(1))
+            if i is None:
+                return self._send(404, {"message": "Not Found"}, match.group(2), bytes_in)
+            comments, forks, _ = m.counts(i)
+            total = comments if match.group(2) == "comments" else forks
+            per_page, page, last = paginate(total, query)
+            start = (page - 1) * per_page
+            items = [
+                {"id": n, "user": m.owner(), "body": "Synthetic comment body " * 8, "created_at": "2024-01-01T00:00:00Z"}
+                if match.group(2) == "comments" else
+                {"id": f"fork{n}", "owner": m.owner(), "created_at": "2024-01-01T00:00:00Z"}
+                for n in range(start, min(total, start + per_page))
+            ]
+            link = link_header(f"http://{self.headers.get('Host')}{path}", query, page, last, per_page)
+            return self._send(200, items, match.group(2), bytes_in, extra={"Link": link} if link else None)
+
+        if path == f"/gists/{m.target_gist_id}":
+            return self._send(200, m.target, "target", bytes_in)
+
+        if path == "/rate_limit":
+            return self._send(200, m.rate_limit_status(), "rate_limit", bytes_in, charge=False)
+
+        self._send(404, {"message": "Not Found"}, "other", bytes_in)
+
+    def do_PATCH(self) -> None:
+        self._delay()
+        m = self.mock
+        raw = self._read_body()
+        bytes_in = len(raw) + len(self.requestline)
+        if urlsplit(self.path).path.rstrip("/") != f"/gists/{m.target_gist_id}":
+            return self._send(404, {"message": "Not Found"}, "patch", bytes_in)
+        payload = json.loads(raw or b"{}")
+        with m.lock:
+            if "description" in payload:
+                m.target["description"] = payload["description"]
+            for name, f in (payload.get("files") or {}).items():
+                if f is None:
+                    m.target["files"].pop(name, None)
+                else:
+                    m.target["files"][name] = {"filename": name, "content": f.get("content", ""), "truncated": False}
+        self._send(200, m.target, "patch", bytes_in)
+
+    def do_POST(self) -> None:
+        self._delay()
+        m = self.mock
+        raw = self._read_body()
+        bytes_in = len(raw) + len(self.requestline)
+        if urlsplit(self.path).path.rstrip("/") != "/graphql":
+            return self._send(404, {"message": "Not Found"}, "graphql", bytes_in, resource="graphql")
+        body = json.loads(raw or b"{}")
+        query = body.get("query") or ""
+        variables = body.get("variables") or {}
+
+        if "node(id:" in query:
+            # Aliased lookups: `gN: node(id: $iN)`, each ID passed as a variable
+            data, errors = {}, []
+            for alias, var in re.findall(r"(\w+): node\(id: \$(\w+)\)", query):
+                node_id = str(variables.get(var) or "")
+                i = m.resolve_node(node_id)
+                if i is None:
+                    data[alias] = None
+                    errors.append({"type": "NOT_FOUND", "path": [alias],
+                                   "message": f"Could not resolve to a node with the global id of '{node_id}'"})
+                    continue
+                comments, forks, stars = m.counts(i)
+                data[alias] = {"stargazerCount": stars, "comments": {"totalCount": comments},
+                               "forks": {"totalCount": forks}}
+            payload: Dict[str, Any] = {"data": data}
+            if errors:
+                payload["errors"] = errors
+            return self._send(200, payload, "nodes", bytes_in, "graphql")
+
+        if "user(login" in query:
+            if variables.get("login") != m.username:
+                return self._send(200, {"data": {"user": None}, "errors": [{"message": "Could not resolve to a User"}]},
+                                  "graphql", bytes_in, "graphql")
+            size = int(variables.get("pageSize") or 100)
+            offset = int(variables.get("cursor") or 0)
+            order = m.sorted_indexes()
+            chunk = order[offset:offset + size]
+            has_next = offset + size < len(order)
+            data = {"user": {"gists": {
+                "pageInfo": {"hasNextPage": has_next, "endCursor": str(offset + size) if has_next else None},
+                "nodes": [m.graphql_gist(i) for i in chunk],
+            }}}
+            return self._send(200, {"data": data}, "graphql", bytes_in, "graphql")
+
+        self._send(200, {"errors": [{"message": "Unsupported query in mock"}]}, "graphql", bytes_in, "graphql")
+
+
+def start_server(mock: MockGitHub, port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock API on 127.0.0.1 in a daemon thread; read the port from server_address."""
+    handler = type("BoundHandler", (Handler,), {"mock": mock})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the mock GitHub API in the foreground.")
+    parser.add_argument("--gists", type=int, default=100)
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-legacy-node-ids", action="store_true",
+                        help="don't resolve legacy base64 gist node IDs in node(id:) lookups")
+    args = parser.parse_args()
+    server = start_server(MockGitHub(args.gists, args.username, args.latency,
+                                     legacy_node_ids=not args.no_legacy_node_ids), args.port)
+    print(f"Mock GitHub API for '{args.username}' ({args.gists} gists) on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+# file: make_gist_list/__init__.py
+
+"""
+Make Gist List - GitHub Gist Markdown List Generator
+
+This tool automatically generates a sortable markdown table of all your public GitHub gists
+and updates a target gist with the generated list. Perfect for creating a portfolio, a showcase 
+of your code snippets and projects, or even a much faster way to see all of your public gists in one place.
+
+Features:
+- Fetches all public gists from a GitHub username
+- Generates a clean, sortable markdown table
+- Includes gist metadata (title, files, language, date, links)
+- Shows engagement metrics (comments, forks, stars)
+- Uses batched GraphQL node() lookups for engagement counts (100 gists per request)
+- Uses custom icons for public/private status
+- Updates a target gist on GitHub automatically
+- Designed to be easily forkable and customizable
+
+Usage:
+    make-gist-list                  # after `pip install .` (or `uv run make-gist-list`)
+    python -m make_gist_list
+    python make-gist-list.py        # from a checkout, without installing
+    make-gist-list --help           # options and environment variables
+
+Configuration comes from environment variables; see config.py for the list.
+
+Modules:
+    cli     - command line entry point, --check-config and --dry-run (no network imports)
+    config  - environment variables, Cfg, logging setup
+    core    - fetch, enrich, render and publish pipeline (imported when a run starts)
+
+Output:
+    - Streams the generated markdown to stdout (or OUTPUT_FILE) as rows are rendered
+    - If LIST_GIST_ID and GIST_TOKEN are provided, the workflow updates the target gist
+    - Creates a clean sortable table with all public gist information
+
+For detailed setup instructions, see README.md and SETUP.md files.
+
+Author: Rich Lewis
+Repository: https://github.com/RichLewis007/Make-Gist-List
+
+Output fields in the generated markdown table:
+  Title (first line of gist description, truncated)
+  Files (count)
+  File Names (actual filenames, truncated if too many)
+  Lang (primary language by largest file)
+  Public (always checking this)
+  Created (when gist was originally created)
+  Updated (when gist was last modified)
+  Link (to the gist)
+  Comments (count)
+  Forks (count)
+  Stars (count)
+  
+Additionally, complete gist descriptions are shown on separate rows below each gist entry
+for better readability and to preserve full context.
+"""
+
+import importlib
+
+from .cli import main
+from .config import VERSION as __version__
+
+__all__ = ["main", "__version__"]
+
+def __getattr__(name: str):
+    # Pipeline functions (iter_documents, GistRecord, ...) live in core, which
+    # imports requests; only load it when one of them is first accessed
+    if name.startswith("__") or name in ("cli", "config", "core"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    core = importlib.import_module(f"{__name__}.core")
+    try:
+        return getattr(core, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,9 @@
+# file: make_gist_list/__main__.py
+
+"""Allow `python -m make_gist_list`."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
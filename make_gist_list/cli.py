@@ -0,0 +1,235 @@
+# file: make_gist_list/cli.py
+
+"""
+Command line entry point (`make-gist-list`, `python -m make_gist_list`).
+
+Only the standard library is imported up front. python-dotenv is imported
+when a .env file exists, and core.py (with requests) once a run actually
+starts, so --help, --version, --check-config and --dry-run stay fast.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from . import config
+from .config import Cfg, load_batch_jobs, load_cfg, logger, output_formats, setup_logging
+
+DESCRIPTION = "Generate a markdown list of a user's public gists and publish it to a target gist."
+
+def build_parser() -> argparse.ArgumentParser:
+    env_help = (config.__doc__ or "")
+    env_help = env_help[env_help.find("Environment Variables:"):]
+    parser = argparse.ArgumentParser(
+        prog="make-gist-list",
+        description=DESCRIPTION,
+        epilog=env_help.rstrip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {config.VERSION}")
+    parser.add_argument("--check-config", action="store_true",
+                        help="validate the configuration from the environment and exit (no network access)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print what a run would do with the current configuration and exit (no network access)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging (same as VERBOSE=true)")
+    return parser
+
+def _find_env_file(folder: str) -> Optional[str]:
+    """Nearest .env file in `folder` or its parents."""
+    while not os.path.isfile(os.path.join(folder, ".env")):
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+    return os.path.join(folder, ".env")
+
+def load_env_file() -> Optional[str]:
+    """
+    Load the nearest .env file from the current directory or its parents.
+
+    If there is none and a .py script was run by path, its directory and
+    parents are searched the same way, so `python /path/to/make-gist-list.py`
+    still picks up the checkout's .env from anywhere. `python -m make_gist_list`
+    and the `make-gist-list` command only search the current directory, so a
+    .env in the checkout doesn't leak into runs from elsewhere (or into
+    benchmarks/bench_import.py). python-dotenv is only imported when such a
+    file exists.
+
+    Returns:
+        Path of the loaded file, or None
+    """
+    script = os.path.abspath(sys.argv[0]) if sys.argv and sys.argv[0] else ""
+    package = os.path.dirname(os.path.abspath(__file__))
+    folders = [os.getcwd()]
+    # Under -m, argv[0] is this package's __main__.py; for the console command it's in bin/
+    if script.endswith(".py") and os.path.isfile(script) and os.path.dirname(script) != package:
+        folders.append(os.path.dirname(script))
+    path = next(filter(None, map(_find_env_file, folders)), None)
+    if path is None:
+        return None
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        # python-dotenv not available, continue without it
+        return None
+    load_dotenv(path)
+    return path
+
+def validate_cfg(cfg: Cfg, batch: bool = False) -> None:
+    """Log a warning for every setting that won't do what it looks like it should."""
+    from zoneinfo import ZoneInfo
+
+    try:
+        ZoneInfo(cfg.timezone)
+    except Exception:
+        logger.warning(f"{cfg.username}: unknown TIMEZONE {cfg.timezone!r}; UTC will be used")
+    if cfg.date_format not in ("YYYY-MM-DD", "DD-MM-YYYY", "MM-DD-YYYY"):
+        logger.warning(f"{cfg.username}: unexpected DATE_FORMAT {cfg.date_format!r}")
+    if cfg.time_format not in ("12", "24"):
+        logger.warning(f"{cfg.username}: TIME_FORMAT should be '12' or '24', got {cfg.time_format!r}")
+    if cfg.list_gist_id and not cfg.token:
+        logger.warning(f"{cfg.username}: LIST_GIST_ID is set but GIST_TOKEN is not; the gist won't be updated")
+    if cfg.fetch_mode == "graphql" and not cfg.token:
+        logger.warning(f"{cfg.username}: FETCH_MODE=graphql requires GIST_TOKEN; REST will be used")
+    if cfg.incremental_listing and not cfg.state_db:
+        logger.warning(f"{cfg.username}: INCREMENTAL_LISTING has no effect without STATE_DB")
+    if cfg.watch and batch:
+        logger.warning("WATCH is not supported with BATCH_CONFIG; the jobs run once")
+    if cfg.watch_min_interval > cfg.watch_max_interval:
+        logger.warning(f"{cfg.username}: WATCH_MIN_INTERVAL is larger than WATCH_MAX_INTERVAL")
+    if cfg.record_snapshot and cfg.replay_snapshot:
+        logger.warning(f"{cfg.username}: RECORD_SNAPSHOT and REPLAY_SNAPSHOT are both set; the run is replayed, not recorded")
+    if cfg.replay_snapshot and not os.path.isfile(cfg.replay_snapshot):
+        logger.warning(f"{cfg.username}: REPLAY_SNAPSHOT {cfg.replay_snapshot} does not exist")
+    if cfg.replay_snapshot and cfg.watch:
+        logger.warning(f"{cfg.username}: WATCH with REPLAY_SNAPSHOT never sees a change")
+    if cfg.filter_since and cfg.filter_until and cfg.filter_since[:10] > cfg.filter_until[:10]:
+        logger.warning(f"{cfg.username}: FILTER_SINCE is after FILTER_UNTIL; no gist will be listed")
+    formats = output_formats(cfg)
+    if cfg.shard_by != "none" and formats[0] not in ("markdown", "html"):
+        logger.warning(f"{cfg.username}: SHARD_BY needs markdown or html first in OUTPUT_FORMATS; {formats[0]} is written as one file")
+    if len(formats) > 1 and not cfg.output_file and not (cfg.list_gist_id and cfg.token):
+        logger.warning(f"{cfg.username}: OUTPUT_FORMATS beyond {formats[0]} need OUTPUT_FILE or a target gist to be written to")
+
+def describe_plan(cfg: Cfg) -> List[str]:
+    """Human-readable summary of what a run with `cfg` would do."""
+    if cfg.fetch_mode == "graphql" and cfg.token:
+        fetch = "GraphQL listing with counts, 100 gists per request"
+    elif cfg.token:
+        fetch = f"REST listing, then all counts via GraphQL node() lookups (100 gists per request, {min(cfg.max_in_flight, 4)} in flight)"
+    else:
+        fetch = f"REST listing, then comments/forks per gist ({cfg.max_in_flight} in flight); no stars without GIST_TOKEN"
+    if cfg.replay_snapshot:
+        fetch += f", replayed from {cfg.replay_snapshot} (no network)"
+    elif cfg.record_snapshot:
+        fetch += f", recorded to {cfg.record_snapshot}"
+    state = "off"
+    if cfg.state_db and not cfg.replay_snapshot:
+        state = f"{cfg.state_db} (counts reused for {cfg.state_ttl_hours}h"
+        state += ", incremental listing)" if cfg.incremental_listing else ")"
+    if cfg.replay_snapshot:
+        publish = "no (replaying a snapshot)"
+    elif cfg.list_gist_id and cfg.token:
+        publish = f"gist {cfg.list_gist_id}, file {cfg.target_md}"
+        if cfg.shard_by != "none":
+            publish += f", sharded by {cfg.shard_by}" + (f" ({cfg.shard_size} per file)" if cfg.shard_by == "page" else "")
+        if len(output_formats(cfg)) > 1:
+            publish += f", plus {len(output_formats(cfg)) - 1} more format file(s)"
+        if cfg.force_publish:
+            publish += ", always written"
+    else:
+        publish = "no (needs LIST_GIST_ID and GIST_TOKEN)"
+    criteria = []
+    if cfg.filter_languages:
+        criteria.append(f"language {', '.join(cfg.filter_languages)}")
+    if cfg.filter_since or cfg.filter_until:
+        criteria.append(f"updated {cfg.filter_since or '...'} to {cfg.filter_until or '...'}")
+    if cfg.filter_files:
+        criteria.append(f"files {', '.join(cfg.filter_files)}")
+    if cfg.limit:
+        criteria.append(f"newest {cfg.limit}")
+    formats = output_formats(cfg)
+    labels = {"markdown": "markdown table", "html": "HTML table", "json": "JSON", "csv": "CSV"}
+    return [
+        f"{cfg.username}:",
+        f"  fetch:    {fetch}",
+        f"  select:   {'; '.join(criteria) or 'all public gists'}",
+        f"  state:    {state}",
+        f"  cache:    {f'{cfg.http_cache_dir} ({cfg.http_cache_max_mb} MB)' if cfg.http_cache else 'off'}",
+        f"  output:   {cfg.output_file or 'stdout'} ({', '.join(labels[f] for f in formats)}; {cfg.timezone})",
+        f"  publish:  {publish}",
+        f"  rate:     {cfg.rate_limit_policy}, reserve {cfg.rate_limit_reserve} REST requests",
+        f"  deadline: {f'{cfg.run_deadline}s, then last-known counts' if cfg.run_deadline else 'none'}",
+        f"  watch:    {f'poll every {cfg.watch_min_interval}-{cfg.watch_max_interval}s' if cfg.watch else 'off'}",
+    ]
+
+class _WarningCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+def check_config(dry_run: bool = False) -> int:
+    """
+    Load and validate the configuration without touching the network.
+
+    Returns:
+        0 if nothing looked wrong, 1 if any warning or error was logged
+    """
+    counter = _WarningCounter()
+    logger.addHandler(counter)
+    try:
+        batch_config = os.getenv("BATCH_CONFIG")
+        if batch_config:
+            base = load_cfg(require_username=False)
+            try:
+                jobs, concurrency = load_batch_jobs(batch_config, base)
+            except (OSError, ValueError) as e:
+                logger.error(f"Cannot read BATCH_CONFIG {batch_config}: {e}")
+                return 1
+        else:
+            jobs, concurrency = [load_cfg()], 1
+        for cfg in jobs:
+            validate_cfg(cfg, batch=bool(batch_config))
+    finally:
+        logger.removeHandler(counter)
+
+    if dry_run:
+        if batch_config:
+            print(f"Batch of {len(jobs)} job(s) from {batch_config}, {concurrency} at a time")
+        for cfg in jobs:
+            print("\n".join(describe_plan(cfg)))
+    elif not counter.count:
+        logger.info("Configuration OK")
+    return 1 if counter.count else 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse the command line, load the configuration and run.
+
+    Returns:
+        Process exit status: the run's exit code (see core.main()), 1 for a bad
+        configuration, 6 for an unhandled error
+    """
+    args = build_parser().parse_args(argv)
+    load_env_file()
+    verbose = args.verbose or os.getenv("VERBOSE", "").lower() in ("1", "true", "yes")
+    setup_logging(verbose)
+    logger.debug("Verbose logging enabled")
+
+    if args.check_config or args.dry_run:
+        return check_config(dry_run=args.dry_run)
+
+    try:
+        # Deferred: importing core pulls in requests and the rest of the network stack
+        from . import core
+        return core.main()
+    except Exception as e:
+        logger.error(f"Unhandled error: {e!r}")
+        return 6
@@ -0,0 +1,404 @@
+# file: make_gist_list/config.py
+
+"""
+Configuration, read from environment variables (and a .env file, see cli.py).
+
+This module only uses the standard library, so --help, --check-config and
+--dry-run can load and validate the configuration without importing requests.
+
+Environment Variables:
+    GITHUB_USERNAME (required) - GitHub username from which to fetch public gists
+    LIST_GIST_ID    (required) - Target gist ID to update with the generated list
+    GIST_TOKEN      (required) - GitHub Personal Access Token (classic type) with "gist" scope (required if updating a gist)
+    TARGET_MD_FILENAME (optional) - Filename for the markdown file in the target gist
+    MAX_IN_FLIGHT   (optional) - Maximum concurrent enrichment requests; GraphQL count lookups are capped at 4 (default 8)
+    FETCH_MODE      (optional) - "rest" (default) or "graphql" for a single-pass GraphQL fetch
+    HTTP_CACHE      (optional) - Set to "false" to bypass the on-disk ETag cache (default "true")
+    HTTP_CACHE_DIR  (optional) - Directory for the ETag cache (default ~/.cache/make-gist-list)
+    HTTP_CACHE_MAX_MB (optional) - Size limit of the ETag cache in MB (default 50)
+    STATE_DB        (optional) - SQLite file enabling incremental mode (reuses counts for unchanged gists)
+    STATE_TTL_HOURS (optional) - Maximum age of stored counts before they are refreshed (default 24)
+    INCREMENTAL_LISTING (optional) - With STATE_DB, only list gists updated since the last run
+    FORCE_PUBLISH   (optional) - Always PATCH the target gist, even if nothing changed
+    OUTPUT_FILE     (optional) - Write the generated markdown to this file instead of stdout
+    OUTPUT_FORMATS  (optional) - Comma-separated formats rendered in one run: markdown, html, json, csv (see output_formats())
+    FILTER_LANGUAGE (optional) - Comma-separated primary languages to list, e.g. "python,shell"
+    FILTER_SINCE    (optional) - Only list gists updated on or after this date (YYYY-MM-DD or ISO 8601)
+    FILTER_UNTIL    (optional) - Only list gists updated on or before this date (YYYY-MM-DD or ISO 8601)
+    FILTER_FILES    (optional) - Comma-separated filename globs; only list gists with a matching file, e.g. "*.py,Dockerfile"
+    LIMIT           (optional) - Only list the N most recently updated gists (after filtering; default 0 = all)
+    RUN_DEADLINE    (optional) - Seconds a run may take; unfinished counts fall back to last-known values (default 0 = none)
+    RECORD_SNAPSHOT (optional) - Record every API response of the run into this archive (gzip JSON Lines)
+    REPLAY_SNAPSHOT (optional) - Run against a recorded archive instead of the network; nothing is published
+    RATE_LIMIT_POLICY (optional) - "degrade" (default), "refuse" or "ignore" when the budget can't cover a run
+    RATE_LIMIT_RESERVE (optional) - REST requests to leave unused for other tools (default 100)
+    BATCH_CONFIG    (optional) - JSON file of jobs to run in one process (see run_batch())
+    METRICS_FILE    (optional) - Write per-endpoint and per-phase metrics here (JSON, or Prometheus for *.prom)
+    GITHUB_API_URL  (optional) - REST API base URL (default https://api.github.com)
+    GITHUB_GRAPHQL_URL (optional) - GraphQL endpoint (default GITHUB_API_URL + /graphql)
+    VERBOSE         (optional) - Set to "true" for debug logging (same as --verbose)
+    UNCHANGED_EXIT_CODE (optional) - Exit status when the gist was left unchanged (default 0)
+    SHARD_BY        (optional) - "none" (default), "year" or "page" to split the list into several files
+    SHARD_SIZE      (optional) - Gists per file with SHARD_BY=page (default 500)
+    WATCH           (optional) - Keep running and republish when the gist listing changes (see run_watch())
+    WATCH_MIN_INTERVAL (optional) - Shortest poll interval in seconds in watch mode (default 60)
+    WATCH_MAX_INTERVAL (optional) - Longest poll interval, and the forced refresh period, in seconds (default 3600)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timezone
+from typing import Any, List, Optional, Tuple, get_args, get_origin, get_type_hints
+
+VERSION = "1.0.0"
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_BATCH_CONCURRENCY = 4
+# Settings of the session a batch shares between its jobs; a job can't override them
+BATCH_SESSION_FIELDS = ("http_cache", "http_cache_dir", "http_cache_max_mb", "run_deadline",
+                        "record_snapshot", "replay_snapshot", "metrics_file", "watch")
+FETCH_MODES = ("rest", "graphql")
+DEFAULT_HTTP_CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "make-gist-list")
+DEFAULT_HTTP_CACHE_MAX_MB = 50
+DEFAULT_STATE_TTL_HOURS = 24
+RATE_LIMIT_POLICIES = ("degrade", "refuse", "ignore")
+DEFAULT_RATE_LIMIT_RESERVE = 100
+OUTPUT_FORMAT_NAMES = ("markdown", "html", "json", "csv")
+SHARD_MODES = ("none", "year", "page")
+DEFAULT_SHARD_SIZE = 500
+# Watch mode polls between these intervals (seconds), backing off while nothing changes
+DEFAULT_WATCH_MIN_INTERVAL = 60
+DEFAULT_WATCH_MAX_INTERVAL = 3600
+
+# Configure logging
+def setup_logging(verbose: bool = False) -> logging.Logger:
+    """
+    Set up logging configuration for the application.
+
+    Safe to call more than once: later calls only change the level.
+    
+    Args:
+        verbose: If True, enables DEBUG level logging
+        
+    Returns:
+        Configured logger instance
+    """
+    level = logging.DEBUG if verbose else logging.INFO
+    logger.setLevel(level)
+    if not logger.handlers:
+        # Create formatter
+        formatter = logging.Formatter(
+            fmt='%(asctime)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        
+        # Create handler for stderr
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        logger.propagate = False
+    for handler in logger.handlers:
+        handler.setLevel(level)
+    return logger
+
+# Shared by every module; handlers are attached by setup_logging(), called from cli.main()
+logger = logging.getLogger("make_gist_list")
+
+@dataclass
+class Cfg:
+    username: str
+    list_gist_id: Optional[str]
+    token: Optional[str]
+    target_md: str
+    timezone: str
+    date_format: str
+    time_format: str
+    use_html_table: bool
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    fetch_mode: str = "rest"
+    http_cache: bool = True
+    http_cache_dir: str = DEFAULT_HTTP_CACHE_DIR
+    http_cache_max_mb: int = DEFAULT_HTTP_CACHE_MAX_MB
+    state_db: Optional[str] = None
+    state_ttl_hours: int = DEFAULT_STATE_TTL_HOURS
+    incremental_listing: bool = False
+    force_publish: bool = False
+    output_file: Optional[str] = None
+    metrics_file: Optional[str] = None
+    rate_limit_policy: str = "degrade"
+    rate_limit_reserve: int = DEFAULT_RATE_LIMIT_RESERVE
+    unchanged_exit_code: int = 0
+    shard_by: str = "none"
+    shard_size: int = DEFAULT_SHARD_SIZE
+    watch: bool = False
+    watch_min_interval: int = DEFAULT_WATCH_MIN_INTERVAL
+    watch_max_interval: int = DEFAULT_WATCH_MAX_INTERVAL
+    output_formats: Optional[List[str]] = None
+    filter_languages: Optional[List[str]] = None
+    filter_since: Optional[str] = None
+    filter_until: Optional[str] = None
+    filter_files: Optional[List[str]] = None
+    limit: int = 0
+    run_deadline: int = 0
+    record_snapshot: Optional[str] = None
+    replay_snapshot: Optional[str] = None
+
+# How batch job values are checked (coerce_field()), mirroring the environment loaders in load_cfg()
+CFG_FIELD_TYPES = get_type_hints(Cfg)
+TRUE_VALUES = ("true", "1", "yes")
+FALSE_VALUES = ("false", "0", "no")
+FIELD_CHOICES = {
+    "fetch_mode": FETCH_MODES,
+    "rate_limit_policy": RATE_LIMIT_POLICIES,
+    "shard_by": SHARD_MODES,
+    "output_formats": OUTPUT_FORMAT_NAMES,
+}
+DATE_FIELDS = ("filter_since", "filter_until")
+# Integer fields that may be 0; the others must be at least 1
+INT_FIELD_MINIMUMS = {"state_ttl_hours": 0, "rate_limit_reserve": 0, "unchanged_exit_code": 0, "limit": 0,
+                      "run_deadline": 0}
+
+def getenv_required(name: str) -> str:
+    v = os.getenv(name)
+    if not v:
+        logger.error(f"Missing required env: {name}")
+        sys.exit(1)
+    return v
+
+def getenv_int(name: str, default: int, minimum: int = 1) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        v = int(raw)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw!r}, using default {default}")
+        return default
+    return max(minimum, v)
+
+def getenv_choice(name: str, choices: Tuple[str, ...], default: str) -> str:
+    v = (os.getenv(name) or default).strip().lower()
+    if v not in choices:
+        logger.warning(f"Invalid {name}={v!r} (expected one of {', '.join(choices)}), using {default!r}")
+        return default
+    return v
+
+def getenv_list(name: str, choices: Optional[Tuple[str, ...]] = None) -> Optional[List[str]]:
+    raw = os.getenv(name)
+    if not raw:
+        return None
+    values: List[str] = []
+    for v in (x.strip().lower() for x in raw.split(",")):
+        if not v:
+            continue
+        if choices is not None and v not in choices:
+            logger.warning(f"Ignoring unknown {name} entry {v!r} (expected {', '.join(choices)})")
+        elif v not in values:
+            values.append(v)
+    return values or None
+
+def normalize_date(raw: str) -> str:
+    """
+    Normalize a date or timestamp to compare with GitHub's timestamps.
+
+    "YYYY-MM-DD" is kept as is; a full ISO 8601 timestamp is converted to UTC
+    ("YYYY-MM-DDTHH:MM:SSZ"). Both compare correctly as plain strings.
+
+    Raises:
+        ValueError: If `raw` is neither
+    """
+    if len(raw) == 10:
+        return date.fromisoformat(raw).isoformat()
+    dt = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def getenv_date(name: str) -> Optional[str]:
+    """Date or timestamp from the environment, normalized by normalize_date()."""
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return normalize_date(raw)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw!r} (expected YYYY-MM-DD or ISO 8601), ignoring it")
+        return None
+
+def output_formats(cfg: Cfg) -> List[str]:
+    """
+    Formats to render, primary first.
+
+    OUTPUT_FORMATS if set, otherwise the single table style chosen by USE_HTML_TABLE.
+    The primary format goes to stdout, OUTPUT_FILE and TARGET_MD_FILENAME as
+    before; the others are written next to it.
+    """
+    return list(cfg.output_formats or ["html" if cfg.use_html_table else "markdown"])
+
+def load_cfg(require_username: bool = True) -> Cfg:
+    token = os.getenv("GIST_TOKEN")
+    return Cfg(
+        username=getenv_required("GITHUB_USERNAME") if require_username else os.getenv("GITHUB_USERNAME", ""),
+        list_gist_id=os.getenv("LIST_GIST_ID"),
+        token=token,
+        target_md=os.getenv("TARGET_MD_FILENAME", "Public-gists.md"),
+        timezone=os.getenv("TIMEZONE", "UTC"),
+        date_format=os.getenv("DATE_FORMAT", "YYYY-MM-DD"),
+        time_format=os.getenv("TIME_FORMAT", "24"),
+        use_html_table=os.getenv("USE_HTML_TABLE", "false").lower() in ("true", "1", "yes"),
+        max_in_flight=getenv_int("MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+        fetch_mode=getenv_choice("FETCH_MODE", FETCH_MODES, "rest"),
+        http_cache=os.getenv("HTTP_CACHE", "true").lower() in ("true", "1", "yes"),
+        http_cache_dir=os.getenv("HTTP_CACHE_DIR") or DEFAULT_HTTP_CACHE_DIR,
+        http_cache_max_mb=getenv_int("HTTP_CACHE_MAX_MB", DEFAULT_HTTP_CACHE_MAX_MB),
+        state_db=os.getenv("STATE_DB") or None,
+        state_ttl_hours=getenv_int("STATE_TTL_HOURS", DEFAULT_STATE_TTL_HOURS, minimum=0),
+        incremental_listing=os.getenv("INCREMENTAL_LISTING", "false").lower() in ("true", "1", "yes"),
+        force_publish=os.getenv("FORCE_PUBLISH", "false").lower() in ("true", "1", "yes"),
+        output_file=os.getenv("OUTPUT_FILE") or None,
+        metrics_file=os.getenv("METRICS_FILE") or None,
+        rate_limit_policy=getenv_choice("RATE_LIMIT_POLICY", RATE_LIMIT_POLICIES, "degrade"),
+        rate_limit_reserve=getenv_int("RATE_LIMIT_RESERVE", DEFAULT_RATE_LIMIT_RESERVE, minimum=0),
+        unchanged_exit_code=getenv_int("UNCHANGED_EXIT_CODE", 0, minimum=0),
+        shard_by=getenv_choice("SHARD_BY", SHARD_MODES, "none"),
+        shard_size=getenv_int("SHARD_SIZE", DEFAULT_SHARD_SIZE),
+        watch=os.getenv("WATCH", "false").lower() in ("true", "1", "yes"),
+        watch_min_interval=getenv_int("WATCH_MIN_INTERVAL", DEFAULT_WATCH_MIN_INTERVAL),
+        watch_max_interval=getenv_int("WATCH_MAX_INTERVAL", DEFAULT_WATCH_MAX_INTERVAL),
+        output_formats=getenv_list("OUTPUT_FORMATS", OUTPUT_FORMAT_NAMES),
+        filter_languages=getenv_list("FILTER_LANGUAGE"),
+        filter_since=getenv_date("FILTER_SINCE"),
+        filter_until=getenv_date("FILTER_UNTIL"),
+        filter_files=getenv_list("FILTER_FILES"),
+        limit=getenv_int("LIMIT", 0, minimum=0),
+        run_deadline=getenv_int("RUN_DEADLINE", 0, minimum=0),
+        record_snapshot=os.getenv("RECORD_SNAPSHOT") or None,
+        replay_snapshot=os.getenv("REPLAY_SNAPSHOT") or None,
+    )
+
+def coerce_field(name: str, value: Any) -> Any:
+    """
+    Convert a JSON value from a batch job to the type of Cfg field `name`.
+
+    Values are checked the way the environment loaders check them: booleans
+    also accept "true"/"1"/"yes" and "false"/"0"/"no", integers also accept
+    digit strings and must reach the loader's minimum, choices and list entries
+    are lower-cased and must be known, lists also accept a comma-separated
+    string, and dates are normalized (see normalize_date()). null is only
+    accepted for Optional fields.
+
+    Raises:
+        ValueError: If `value` doesn't fit the field
+    """
+    hint = CFG_FIELD_TYPES[name]
+    args = get_args(hint)
+    optional = type(None) in args
+    kind = next(t for t in args if t is not type(None)) if optional else hint
+    if value is None:
+        if optional:
+            return None
+        raise ValueError(f"{name} can't be null")
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in TRUE_VALUES + FALSE_VALUES:
+            return value.strip().lower() in TRUE_VALUES
+        raise ValueError(f"{name} must be true or false, got {value!r}")
+    if kind is int:
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"{name} must be an integer, got {value!r}")
+        minimum = INT_FIELD_MINIMUMS.get(name, 1)
+        if value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}, got {value}")
+        return value
+    if get_origin(kind) is list:
+        items = value.split(",") if isinstance(value, str) else value
+        if not isinstance(items, list) or not all(isinstance(x, str) for x in items):
+            raise ValueError(f"{name} must be a list of strings or a comma-separated string, got {value!r}")
+        values: List[str] = []
+        for v in (x.strip().lower() for x in items):
+            if not v or v in values:
+                continue
+            if name in FIELD_CHOICES and v not in FIELD_CHOICES[name]:
+                raise ValueError(f"{name} entry {v!r} must be one of {', '.join(FIELD_CHOICES[name])}")
+            values.append(v)
+        return values or None
+    # str fields; numeric gist IDs are accepted as numbers
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string, got {value!r}")
+    if name in FIELD_CHOICES:
+        value = value.strip().lower()
+        if value not in FIELD_CHOICES[name]:
+            raise ValueError(f"{name} must be one of {', '.join(FIELD_CHOICES[name])}, got {value!r}")
+    elif name in DATE_FIELDS:
+        try:
+            value = normalize_date(value.strip())
+        except ValueError:
+            raise ValueError(f"{name} must be YYYY-MM-DD or ISO 8601, got {value!r}") from None
+    if optional and not value:
+        return None
+    return value
+
+def load_batch_jobs(path: str, base: Cfg) -> Tuple[List[Cfg], int]:
+    """
+    Read batch jobs from a JSON config file.
+
+    The file holds either a list of jobs or an object with a "jobs" list and an
+    optional "concurrency". Each job needs "username" and may override any other
+    Cfg field except the shared session's (BATCH_SESSION_FIELDS), typically
+    "list_gist_id", "target_md" and "token":
+
+        {"concurrency": 4,
+         "jobs": [{"username": "alice", "list_gist_id": "abc123", "target_md": "Public-gists.md"}]}
+
+    Each value is checked against the Cfg field's type (see coerce_field()).
+    Fields a job doesn't set come from the environment (`base`). A shared STATE_DB
+    or OUTPUT_FILE is split per user so jobs don't prune each other's state or
+    overwrite each other's output.
+
+    Returns:
+        (job configurations, number of jobs to run concurrently)
+
+    Raises:
+        ValueError: If the file isn't valid JSON or a job field has a bad value
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"jobs": data}
+    concurrency = int(data.get("concurrency") or DEFAULT_BATCH_CONCURRENCY)
+    known = set(Cfg.__dataclass_fields__)
+    jobs: List[Cfg] = []
+    for i, job in enumerate(data.get("jobs") or []):
+        if not isinstance(job, dict):
+            raise ValueError(f"batch job #{i + 1} must be an object, got {job!r}")
+        unknown = set(job) - known
+        if unknown or not job.get("username"):
+            logger.error(f"Batch job #{i + 1}: needs 'username'; unknown keys: {sorted(unknown) or 'none'}")
+            sys.exit(1)
+        shared = sorted(set(job) & set(BATCH_SESSION_FIELDS))
+        if shared:
+            logger.error(f"Batch job #{i + 1}: {', '.join(shared)} can't be set per job; set them in the environment")
+            sys.exit(1)
+        try:
+            fields = {name: coerce_field(name, value) for name, value in job.items()}
+        except ValueError as e:
+            raise ValueError(f"batch job #{i + 1} ({job['username']}): {e}") from None
+        cfg = replace(base, **fields)
+        if base.state_db and "state_db" not in job:
+            root, ext = os.path.splitext(base.state_db)
+            cfg.state_db = f"{root}-{cfg.username}{ext or '.sqlite'}"
+        if base.output_file and "output_file" not in job:
+            root, ext = os.path.splitext(base.output_file)
+            cfg.output_file = f"{root}-{cfg.username}{ext or '.md'}"
+        jobs.append(cfg)
+    return jobs, max(1, concurrency)
@@ -0,0 +1,2735 @@
+# file: make_gist_list/core.py
+
+"""
+Fetch, enrich, render and publish pipeline.
+
+Everything that talks to GitHub lives here, so this module (and requests with
+it) is only imported once a run actually starts; see cli.py. Configuration is
+read by config.py.
+"""
+
+from __future__ import annotations
+
+import base64
+import codecs
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import math
+import os
+import re
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests import Response, Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .config import (
+    DEFAULT_HTTP_CACHE_MAX_MB,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_SHARD_SIZE,
+    Cfg,
+    load_batch_jobs,
+    load_cfg,
+    logger,
+    output_formats,
+)
+
+# GitHub Actions sets both for the current host; overriding them also allows
+# GitHub Enterprise Server and the local mock API in benchmarks/
+API = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GRAPHQL_API = os.getenv("GITHUB_GRAPHQL_URL") or f"{API}/graphql"
+TIMEOUT = 30
+RETRIES = 3
+ENRICH_CHUNK_SIZE = 50
+# Gists per aliased node() lookup; GitHub resolves at most 100 IDs per query
+GRAPHQL_NODE_BATCH = 100
+# Nodes a lookup query may request. GitHub charges one rate-limit point per 100
+# nodes, so a full batch costs 3 points
+GRAPHQL_NODE_BUDGET = 300
+# Nodes requested per gist: the gist plus its comments and forks connections
+GIST_COUNTS_NODE_COST = 3
+# Lookup queries in flight at once; GitHub's secondary limits penalize heavy GraphQL concurrency
+GRAPHQL_NODE_PARALLEL = 4
+GRAPHQL_PAGE_SIZE = 100
+GRAPHQL_FILES_LIMIT = 100
+# Bytes read at a time when decoding a streamed listing page
+LISTING_CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = " \t\r\n"
+# Characters that can end a number inside an array
+JSON_DELIMITERS = ",]" + JSON_WHITESPACE
+# Overlap between incremental listings, to absorb clock skew with GitHub
+LISTING_SKEW_SECONDS = 300
+TIMESTAMP_PREFIX = "**Last updated:**"
+GENERATED_AT_PREFIX = '  "generated_at":'
+# Start spreading requests out once a budget drops below this fraction of its limit
+RATE_LIMIT_LOW_WATERMARK = 0.1
+# Longest gap pacing inserts between two requests; an exhausted budget still waits for reset
+MAX_PACING_DELAY = 2.0
+# GitHub asks for at least one second between mutating requests (secondary limits)
+MUTATION_INTERVAL = 1.0
+# RUN_DEADLINE: time kept for rendering and publishing (at most this, or 20% of the deadline)
+DEADLINE_RESERVE = 15.0
+# Shortest timeout a request gets when the deadline is close (publishing still needs to finish)
+MIN_REQUEST_TIMEOUT = 5.0
+
+RETRY_BACKOFF = 2.0
+USER_AGENT = "make-gist-list-script/1.0 (+https://github.com/)"
+
+def endpoint_class(method: str, url: str) -> str:
+    """Group a request URL into the endpoint classes reported by RunMetrics."""
+    path = urlsplit(url).path.rstrip("/")
+    if path.endswith("/graphql"):
+        return "graphql"
+    if re.search(r"/users/[^/]+/gists$", path):
+        return "list"
+    match = re.search(r"/gists/[^/]+/(comments|forks)$", path)
+    if match:
+        return match.group(1)
+    if re.search(r"/gists/[^/]+$", path):
+        return "publish" if method.upper() == "PATCH" else "gist"
+    if "githubusercontent.com" in url:
+        return "raw"
+    return "other"
+
+class RunMetrics:
+    """
+    Per-request and per-phase performance data for one run (or one batch).
+
+    Requests are recorded by a session response hook installed by make_session(),
+    so every call made through the session is covered. Retries and transport
+    errors are reported by _req_with_retry(). Phases are timed with `phase()`;
+    nested phases are exclusive, so time spent enriching inside the streaming
+    renderer isn't also counted as rendering.
+
+    Body bytes are counted as they are read, so streamed responses count what
+    was actually downloaded. Responses served from the conditional cache count
+    as cache hits, and their bodies as `cache_bytes`, not as `bytes`.
+
+    The report is written as JSON or, for a path ending in .prom, as a
+    Prometheus textfile-collector file.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started = time.time()
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+        self.phases: Dict[str, float] = {}
+        self.rate_limit: Dict[str, Dict[str, int]] = {}
+
+    def _endpoint(self, name: str) -> Dict[str, Any]:
+        return self.endpoints.setdefault(name, {
+            "requests": 0, "statuses": {}, "seconds_total": 0.0, "seconds_max": 0.0,
+            "bytes": 0, "retries": 0, "errors": 0, "cache_hits": 0, "cache_bytes": 0,
+        })
+
+    def on_response(self, r: Response, *args: Any, **kw: Any) -> Response:
+        """requests response hook: record latency, status, size and rate-limit headers."""
+        request = r.request
+        name = endpoint_class(request.method or "GET", request.url or "")
+        seconds = r.elapsed.total_seconds()
+        from_cache = getattr(r, "from_cache", False)
+        # Hooks run before the body is read, streamed or not; count it as it is read
+        size = 0
+        if r.raw is None or getattr(r, "_content_consumed", False):
+            size = len(r.content or b"")
+        else:
+            r.raw = _CountingBody(r.raw, lambda n: self._add_bytes(name, n))
+        h = r.headers
+        with self._lock:
+            e = self._endpoint(name)
+            e["requests"] += 1
+            e["statuses"][str(r.status_code)] = e["statuses"].get(str(r.status_code), 0) + 1
+            e["seconds_total"] += seconds
+            e["seconds_max"] = max(e["seconds_max"], seconds)
+            if from_cache:
+                e["cache_hits"] += 1
+                e["cache_bytes"] += size
+            else:
+                e["bytes"] += size
+            remaining = h.get("X-RateLimit-Remaining")
+            if remaining and remaining.isdigit():
+                resource = (h.get("X-RateLimit-Resource") or ("graphql" if name == "graphql" else "core")).lower()
+                self.rate_limit[resource] = {
+                    "limit": int(h.get("X-RateLimit-Limit") or 0),
+                    "remaining": int(remaining),
+                    "reset": int(h.get("X-RateLimit-Reset") or 0),
+                }
+        return r
+
+    def _add_bytes(self, name: str, size: int) -> None:
+        with self._lock:
+            self._endpoint(name)["bytes"] += size
+
+    def record_retry(self, method: str, url: str) -> None:
+        with self._lock:
+            self._endpoint(endpoint_class(method, url))["retries"] += 1
+
+    def record_error(self, method: str, url: str) -> None:
+        with self._lock:
+            self._endpoint(endpoint_class(method, url))["errors"] += 1
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a phase of the run; time spent in a nested phase is only counted there."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            parent = stack[-1]
+            self._add_phase(parent[0], now - parent[1])
+        frame = [name, now]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            self._add_phase(name, end - frame[1])
+            if stack:
+                stack[-1][1] = end
+
+    def _add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started,
+                "duration_seconds": round(time.time() - self.started, 3),
+                "phases": {k: round(v, 3) for k, v in self.phases.items()},
+                "endpoints": json.loads(json.dumps(self.endpoints)),
+                "rate_limit": dict(self.rate_limit),
+            }
+
+    def to_prometheus(self) -> str:
+        data = self.report()
+        p = "make_gist_list"
+        out = [
+            f"# HELP {p}_run_timestamp_seconds Start time of the run.",
+            f"# TYPE {p}_run_timestamp_seconds gauge",
+            f"{p}_run_timestamp_seconds {data['started_at']:.0f}",
+            f"# HELP {p}_run_duration_seconds Wall time of the run.",
+            f"# TYPE {p}_run_duration_seconds gauge",
+            f"{p}_run_duration_seconds {data['duration_seconds']}",
+            f"# HELP {p}_phase_seconds Time spent in each phase of the run.",
+            f"# TYPE {p}_phase_seconds gauge",
+        ]
+        out += [f'{p}_phase_seconds{{phase="{k}"}} {v}' for k, v in sorted(data["phases"].items())]
+        out += [
+            f"# HELP {p}_requests_total HTTP requests by endpoint class and status.",
+            f"# TYPE {p}_requests_total counter",
+        ]
+        for name, e in sorted(data["endpoints"].items()):
+            out += [f'{p}_requests_total{{endpoint="{name}",status="{s}"}} {n}' for s, n in sorted(e["statuses"].items())]
+        for metric, key, help_text in (
+            ("request_seconds_total", "seconds_total", "Total request latency by endpoint class."),
+            ("request_seconds_max", "seconds_max", "Slowest request by endpoint class."),
+            ("response_bytes_total", "bytes", "Response body bytes read from the network by endpoint class."),
+            ("retries_total", "retries", "Retried requests by endpoint class."),
+            ("errors_total", "errors", "Transport errors by endpoint class."),
+            ("cache_hits_total", "cache_hits", "Responses served from the conditional cache."),
+            ("cache_hit_bytes_total", "cache_bytes", "Response body bytes served from the conditional cache."),
+        ):
+            out += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} {'gauge' if key == 'seconds_max' else 'counter'}"]
+            out += [f'{p}_{metric}{{endpoint="{name}"}} {round(e[key], 6)}' for name, e in sorted(data["endpoints"].items())]
+        out += [
+            f"# HELP {p}_rate_limit_remaining Remaining rate-limit budget at the end of the run.",
+            f"# TYPE {p}_rate_limit_remaining gauge",
+        ]
+        out += [f'{p}_rate_limit_remaining{{resource="{k}"}} {v["remaining"]}' for k, v in sorted(data["rate_limit"].items())]
+        return "\n".join(out) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the report to `path`: Prometheus text format for *.prom, JSON otherwise."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.report(), indent=2) + "\n"
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        # Atomic rename so a textfile collector never reads a partial file
+        os.replace(tmp, path)
+        logger.info(f"Wrote run metrics to {path}")
+
+def _phase(session: Session, name: str) -> Any:
+    """Time a phase with the session's RunMetrics, if it has one."""
+    metrics = getattr(session, "metrics", None)
+    return metrics.phase(name) if metrics else nullcontext()
+
+class RunDeadline:
+    """
+    Wall-clock budget for a run (RUN_DEADLINE), shared through the session.
+
+    Once less than `reserve` seconds are left, enrichment stops starting new
+    requests (see iter_enriched()), keeping that time to render and publish the
+    partial list. Request timeouts are capped to the time left and failed
+    requests are not retried past the deadline, so one slow endpoint can't hold
+    the run for RETRIES x TIMEOUT.
+    """
+
+    def __init__(self, seconds: float, reserve: Optional[float] = None) -> None:
+        self.ends = time.monotonic() + seconds
+        self.reserve = min(DEADLINE_RESERVE, seconds * 0.2) if reserve is None else reserve
+
+    def remaining(self) -> float:
+        return self.ends - time.monotonic()
+
+    def expired(self) -> bool:
+        """True once enrichment should stop to leave time for publishing."""
+        return self.remaining() < self.reserve
+
+    def timeout(self, default: float) -> float:
+        """Request timeout: `default`, capped to the time left (but never below MIN_REQUEST_TIMEOUT)."""
+        return max(MIN_REQUEST_TIMEOUT, min(default, self.remaining()))
+
+class RateLimitDeadline(requests.RequestException):
+    """The rate limit allows the next request only after the run deadline; not retried."""
+
+class RateLimitScheduler:
+    """
+    Central pacing for every GitHub request made through a session.
+
+    The scheduler reads X-RateLimit-Limit/Remaining/Reset/Resource and Retry-After
+    from every response and tracks the REST ("core") and GraphQL budgets
+    separately. Before each request it:
+
+    - waits out any Retry-After or exhausted-budget pause,
+    - spreads requests over the time left until reset (at most MAX_PACING_DELAY
+      apart) once a budget drops below RATE_LIMIT_LOW_WATERMARK of its limit,
+    - keeps mutating REST requests at least MUTATION_INTERVAL apart.
+
+    Budgets are decremented optimistically when a request is sent so that
+    concurrent workers don't overshoot, and corrected from the response headers.
+
+    `deadline` is the run's RunDeadline (set by make_session()): no wait is
+    allowed to run past it. A request whose slot only comes after the deadline
+    raises RateLimitDeadline at once, so enrichment falls back to last-known
+    counts instead of sleeping until the reset.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.deadline: Optional[RunDeadline] = None
+        self.budgets: Dict[str, Dict[str, int]] = {}
+        self._paused_until = 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._last_mutation = 0.0
+
+    @staticmethod
+    def resource_for(url: str) -> str:
+        return "graphql" if url.split("?", 1)[0].rstrip("/").endswith("/graphql") else "core"
+
+    def remaining(self, resource: str) -> Optional[int]:
+        with self._lock:
+            b = self.budgets.get(resource)
+            return b["remaining"] if b else None
+
+    def _delay(self, resource: str, method: str, now: float) -> float:
+        """Seconds to wait before the next request may go out (lock held)."""
+        wait = self._paused_until - now
+        b = self.budgets.get(resource)
+        if b:
+            if b["remaining"] <= 0 and b["reset"] > now:
+                wait = max(wait, b["reset"] - now + 1)
+            elif b["limit"] and b["remaining"] < b["limit"] * RATE_LIMIT_LOW_WATERMARK:
+                wait = max(wait, self._next_slot.get(resource, 0.0) - now)
+        if method not in ("GET", "HEAD") and resource == "core":
+            wait = max(wait, self._last_mutation + MUTATION_INTERVAL - now)
+        return wait
+
+    def acquire(self, method: str, url: str) -> None:
+        """
+        Block until a request to `url` fits within the known budgets.
+
+        Raises:
+            RateLimitDeadline: If that would take longer than the time left before `deadline`
+        """
+        resource = self.resource_for(url)
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = self._delay(resource, method, now)
+                if wait <= 0:
+                    b = self.budgets.get(resource)
+                    if b:
+                        b["remaining"] -= 1
+                        if b["remaining"] > 0 and b["reset"] > now:
+                            gap = min(MAX_PACING_DELAY, (b["reset"] - now) / b["remaining"])
+                            self._next_slot[resource] = now + gap
+                    if method not in ("GET", "HEAD") and resource == "core":
+                        self._last_mutation = now
+                    return
+            deadline = self.deadline
+            if deadline and wait > deadline.remaining():
+                raise RateLimitDeadline(f"the {resource} rate limit allows the next request in {wait:.0f}s, "
+                                        f"after the run deadline")
+            if wait > 5:
+                logger.warning(f"Rate limit pacing: waiting {wait:.0f}s before next {resource} request…")
+            time.sleep(wait)
+
+    def seed(self, resources: Dict[str, Any]) -> None:
+        """Set the core and GraphQL budgets from the `resources` of a GET /rate_limit response."""
+        with self._lock:
+            for resource in ("core", "graphql"):
+                b = resources.get(resource) or {}
+                if not all(isinstance(b.get(k), int) for k in ("limit", "remaining", "reset")):
+                    continue
+                prev = self.budgets.get(resource)
+                new = {"limit": b["limit"], "remaining": b["remaining"], "reset": b["reset"]}
+                if prev and prev["reset"] == new["reset"]:
+                    new["remaining"] = min(new["remaining"], prev["remaining"])
+                self.budgets[resource] = new
+
+    def observe(self, url: str, r: Response) -> None:
+        """Update budgets and pauses from a response's rate-limit headers."""
+        h = r.headers
+        now = time.time()
+        resource = (h.get("X-RateLimit-Resource") or self.resource_for(url)).lower()
+        with self._lock:
+            limit, remaining, reset = (h.get("X-RateLimit-Limit"), h.get("X-RateLimit-Remaining"),
+                                       h.get("X-RateLimit-Reset"))
+            if limit and remaining and reset and limit.isdigit() and remaining.isdigit() and reset.isdigit():
+                prev = self.budgets.get(resource)
+                new = {"limit": int(limit), "remaining": int(remaining), "reset": int(reset)}
+                # Responses can arrive out of order; within one window trust the lowest count
+                if prev and prev["reset"] == new["reset"]:
+                    new["remaining"] = min(new["remaining"], prev["remaining"] + 1)
+                self.budgets[resource] = new
+                if r.status_code in (403, 429) and new["remaining"] == 0:
+                    self._paused_until = max(self._paused_until, new["reset"] + 1)
+                    return
+            retry_after = h.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                self._paused_until = max(self._paused_until, now + int(retry_after))
+            elif _is_rate_limited(r):
+                # Secondary limit without a Retry-After: GitHub asks to wait at least a minute
+                self._paused_until = max(self._paused_until, now + 60)
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Transport adapter that routes every request through a RateLimitScheduler."""
+
+    def __init__(self, scheduler: RateLimitScheduler, **kw: Any) -> None:
+        super().__init__(**kw)
+        self.scheduler = scheduler
+
+    def send(self, request: requests.PreparedRequest, **kw: Any) -> Response:
+        self.scheduler.acquire(request.method or "GET", request.url or "")
+        r = super().send(request, **kw)
+        self.scheduler.observe(request.url or "", r)
+        return r
+
+class _TeeBody:
+    """
+    Stand-in for a urllib3 response body that copies what is read from it.
+
+    Once the body has been streamed to the end, the bytes read are passed to
+    `on_complete`. A body that is never fully read is never passed on.
+    Everything else is delegated to the wrapped response.
+    """
+
+    def __init__(self, raw: Any, on_complete: Callable[[bytes], None]) -> None:
+        self._raw = raw
+        self._on_complete = on_complete
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        parts = []
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            parts.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(parts))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+class _CountingBody:
+    """
+    Stand-in for a urllib3 response body that reports the size of every chunk
+    read from it to `on_read`. Everything else is delegated to the wrapped
+    response.
+    """
+
+    def __init__(self, raw: Any, on_read: Callable[[int], None]) -> None:
+        self._raw = raw
+        self._on_read = on_read
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._on_read(len(chunk))
+            yield chunk
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+class ConditionalCacheAdapter(RateLimitedAdapter):
+    """
+    Transport adapter that adds an on-disk HTTP validator cache to GET requests.
+
+    For every cacheable GET the adapter remembers the ETag / Last-Modified
+    validators and the response body. Later requests for the same URL are sent
+    with If-None-Match / If-Modified-Since; when GitHub answers 304 Not Modified
+    (which does not count against the rate limit) the cached body is served as a
+    regular 200 response with `from_cache` set to True.
+
+    Entries are keyed by URL and token, stored as <key>.json (metadata) plus
+    <key>.body files, and evicted least-recently-used first once the cache grows
+    beyond `max_bytes`.
+
+    A new body is stored as it is read (_TeeBody), so streamed requests are
+    still decoded while the bytes arrive. Requests sent with
+    "Cache-Control: no-cache" bypass the cache.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, scheduler: RateLimitScheduler, **kw: Any) -> None:
+        super().__init__(scheduler, **kw)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(
+            os.path.getsize(os.path.join(cache_dir, n))
+            for n in os.listdir(cache_dir) if n.endswith((".json", ".body"))
+        )
+
+    def _key(self, request: requests.PreparedRequest) -> str:
+        auth = request.headers.get("Authorization", "")
+        return hashlib.sha256(f"{request.url}\0{auth}".encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def _load(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def _store(self, key: str, meta: Dict[str, Any], body: bytes) -> None:
+        meta_path, body_path = self._paths(key)
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        with self._lock:
+            self._size -= self._entry_size(key)
+            try:
+                with open(body_path, "wb") as f:
+                    f.write(body)
+                with open(meta_path, "wb") as f:
+                    f.write(meta_bytes)
+            except OSError as e:
+                logger.debug(f"HTTP cache write failed for {meta.get('url')}: {e}")
+                return
+            self._size += len(body) + len(meta_bytes)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entry_size(self, key: str) -> int:
+        total = 0
+        for path in self._paths(key):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def _touch(self, key: str) -> None:
+        try:
+            os.utime(self._paths(key)[1])
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes (lock held)."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".body"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), name[:-len(".body")]))
+                except OSError:
+                    pass
+        entries.sort()
+        target = self.max_bytes * 0.9
+        for _, key in entries:
+            if self._size <= target:
+                break
+            self._size -= self._entry_size(key)
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        logger.debug(f"HTTP cache evicted down to {self._size} bytes")
+
+    def send(self, request: requests.PreparedRequest, **kw: Any) -> Response:
+        if request.method != "GET" or "no-cache" in request.headers.get("Cache-Control", ""):
+            return super().send(request, **kw)
+
+        key = self._key(request)
+        cached = self._load(key)
+        if cached:
+            meta, _ = cached
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        r = super().send(request, **kw)
+        r.from_cache = False
+
+        if r.status_code == 304 and cached:
+            meta, body = cached
+            self._touch(key)
+            # Drain the (empty) 304 first so a streamed request hands its connection back
+            r.content
+            r.status_code = 200
+            r.reason = "OK (cached)"
+            r._content = body
+            for name, value in meta.get("headers", {}).items():
+                r.headers.setdefault(name, value)
+            r.from_cache = True
+            logger.debug(f"HTTP cache hit (304): {request.url}")
+        elif r.status_code == 200 and (r.headers.get("ETag") or r.headers.get("Last-Modified")):
+            meta = {
+                "url": request.url,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "headers": {k: v for k, v in r.headers.items() if k.lower() in ("content-type", "link")},
+            }
+            r.raw = _TeeBody(r.raw, lambda body: self._store(key, meta, body))
+        return r
+
+def snapshot_key(request: requests.PreparedRequest) -> str:
+    """Identity of a request in a snapshot archive: method, full URL and a hash of the body."""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return f"{request.method} {request.url} {hashlib.sha256(body).hexdigest()[:16] if body else '-'}"
+
+class SnapshotMiss(requests.RequestException):
+    """A replayed run made a request that the snapshot archive doesn't hold."""
+
+class SnapshotRecorder(BaseAdapter):
+    """
+    Transport adapter that records every response of a run into a snapshot archive.
+
+    Wraps the adapter that really talks to GitHub. Each response is appended to
+    a gzip-compressed JSON Lines file as {"key", "status", "headers", "body"}
+    (see snapshot_key()), keeping only the headers the pipeline reads, so a
+    snapshot of a full run is a fraction of the transferred size. The archive
+    is complete once the session is closed. SnapshotReplayer plays it back.
+    """
+
+    HEADERS = ("content-type", "link", "etag", "last-modified")
+
+    def __init__(self, inner: BaseAdapter, path: str) -> None:
+        super().__init__()
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        self._out: Optional[TextIO] = gzip.open(path, "wt", encoding="utf-8")
+        self.recorded = 0
+
+    def send(self, request: requests.PreparedRequest, **kw: Any) -> Response:
+        r = self.inner.send(request, **kw)
+        entry = {
+            "key": snapshot_key(request),
+            "status": r.status_code,
+            "headers": {k: v for k, v in r.headers.items() if k.lower() in self.HEADERS},
+            # surrogateescape keeps non-UTF-8 bodies byte-exact through JSON
+            "body": r.content.decode("utf-8", "surrogateescape"),
+        }
+        with self._lock:
+            if self._out is not None:
+                self._out.write(json.dumps(entry) + "\n")
+                self.recorded += 1
+        return r
+
+    def close(self) -> None:
+        with self._lock:
+            if self._out is not None:
+                self._out.close()
+                self._out = None
+                logger.info(f"Recorded {self.recorded} response(s) to {self.path}")
+        self.inner.close()
+
+class SnapshotReplayer(BaseAdapter):
+    """
+    Transport adapter that answers every request from a snapshot archive.
+
+    No request reaches the network and none is paced by the rate-limit
+    scheduler, so a replayed run only costs rendering time. A request that
+    isn't in the archive raises SnapshotMiss, which is not retried.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                # A request made twice replays its last response
+                self.entries[entry["key"]] = entry
+        logger.info(f"Replaying {len(self.entries)} response(s) from {path}")
+
+    def send(self, request: requests.PreparedRequest, **kw: Any) -> Response:
+        entry = self.entries.get(snapshot_key(request))
+        if entry is None:
+            raise SnapshotMiss(f"{request.method} {request.url} is not in the snapshot", request=request)
+        r = Response()
+        r.status_code = entry["status"]
+        r.reason = "OK (replayed)" if r.status_code == 200 else "Replayed"
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r._content = entry["body"].encode("utf-8", "surrogateescape")
+        r._content_consumed = True
+        r.encoding = "utf-8"
+        r.url = request.url
+        r.request = request
+        r.from_cache = False
+        return r
+
+    def close(self) -> None:
+        pass
+
+def make_session(token: Optional[str], pool_size: int = DEFAULT_MAX_IN_FLIGHT,
+                 cache_dir: Optional[str] = None, cache_max_mb: int = DEFAULT_HTTP_CACHE_MAX_MB,
+                 scheduler: Optional[RateLimitScheduler] = None, metrics: Optional[RunMetrics] = None,
+                 deadline: Optional[RunDeadline] = None, record_snapshot: Optional[str] = None,
+                 replay_snapshot: Optional[str] = None) -> Session:
+    s = requests.Session()
+    scheduler = scheduler or RateLimitScheduler()
+    scheduler.deadline = deadline
+    s.metrics = metrics
+    s.deadline = deadline
+    if metrics:
+        s.hooks["response"].append(metrics.on_response)
+    # Size the connection pool so concurrent enrichment workers reuse warm
+    # keep-alive connections instead of opening (and discarding) new ones.
+    adapter: BaseAdapter
+    if replay_snapshot:
+        adapter = SnapshotReplayer(replay_snapshot)
+        # Proxy and .netrc lookups cost more than a replayed response
+        s.trust_env = False
+    elif cache_dir:
+        adapter = ConditionalCacheAdapter(cache_dir, cache_max_mb * 1024 * 1024, scheduler,
+                                          pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = RateLimitedAdapter(scheduler, pool_connections=pool_size, pool_maxsize=pool_size)
+    if record_snapshot and not replay_snapshot:
+        adapter = SnapshotRecorder(adapter, record_snapshot)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+        "User-Agent": USER_AGENT,
+    })
+    if token:
+        s.headers["Authorization"] = f"token {token}"
+    return s
+
+def job_session(s: Session, token: Optional[str]) -> Session:
+    """
+    A session that authenticates with `token` but shares everything else with `s`.
+
+    The transport adapters (connection pools, RateLimitScheduler, HTTP cache,
+    snapshot recorder or replayer), the response hooks, metrics and deadline are
+    the same objects as in `s`; only the Authorization header differs. Used for
+    batch jobs with their own token. Close `s`, not the job session.
+    """
+    js = requests.Session()
+    js.adapters = s.adapters
+    js.headers = CaseInsensitiveDict(s.headers)
+    js.hooks = {event: list(hooks) for event, hooks in s.hooks.items()}
+    js.trust_env = s.trust_env
+    js.metrics = getattr(s, "metrics", None)
+    js.deadline = getattr(s, "deadline", None)
+    js.headers.pop("Authorization", None)
+    if token:
+        js.headers["Authorization"] = f"token {token}"
+    return js
+
+def _is_rate_limited(r: Response) -> bool:
+    if r.status_code not in (403, 429):
+        return False
+    return (r.status_code == 429
+            or "Retry-After" in r.headers
+            or r.headers.get("X-RateLimit-Remaining") == "0"
+            or "rate limit" in (r.text or "").lower())
+
+def _req_with_retry(s: Session, method: str, url: str, **kw: Any) -> Response:
+    last: Optional[Exception] = None
+    metrics: Optional[RunMetrics] = getattr(s, "metrics", None)
+    deadline: Optional[RunDeadline] = getattr(s, "deadline", None)
+    for attempt in range(1, RETRIES + 1):
+        try:
+            r = s.request(method, url, timeout=deadline.timeout(TIMEOUT) if deadline else TIMEOUT, **kw)
+            if _is_rate_limited(r) and attempt < RETRIES:
+                # The session's RateLimitScheduler has recorded the Retry-After or
+                # reset time from this response and will hold the retry until then,
+                # or raise RateLimitDeadline if that is after the run deadline.
+                logger.warning(f"Rate limited ({r.status_code}); retrying after the limit resets…")
+                if metrics:
+                    metrics.record_retry(method, url)
+                continue
+            if 500 <= r.status_code < 600:
+                raise requests.HTTPError(f"{r.status_code} {r.reason}", response=r)
+            return r
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            last = e
+            if metrics and not isinstance(e, requests.HTTPError):
+                metrics.record_error(method, url)
+            if attempt == RETRIES or (deadline and deadline.remaining() <= 0):
+                break
+            if metrics:
+                metrics.record_retry(method, url)
+            backoff = RETRY_BACKOFF ** (attempt - 1)
+            if deadline:
+                backoff = max(0.0, min(backoff, deadline.remaining()))
+            logger.warning(f"Transient error ({e}); retry {attempt}/{RETRIES-1} in {backoff:.1f}s…")
+            time.sleep(backoff)
+    assert last is not None
+    raise last
+
+def _link_page(r: Response, rel: str) -> Optional[int]:
+    """Page number of a rel="..." entry in the response's Link header, if present."""
+    url = (r.links.get(rel) or {}).get("url")
+    if not url:
+        return None
+    page = parse_qs(urlsplit(url).query).get("page")
+    return int(page[0]) if page and page[0].isdigit() else None
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Decode a JSON array incrementally, yielding each element once its bytes have arrived.
+
+    Elements are decoded one at a time with the C-accelerated json scanner
+    (JSONDecoder.scan_once) from a buffer that only holds the not yet decoded
+    tail of the input. The caller can project each element and drop it before
+    the next is parsed, so a page never exists as one big Python object graph.
+
+    Raises:
+        ValueError: If the input is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    # The scanner behind raw_decode(), minus its wrapper and error formatting
+    scan = decoder.scan_once
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    source = iter(chunks)
+    buf, pos = "", 0
+    expect = "["
+
+    def more() -> bool:
+        nonlocal buf, pos
+        for chunk in source:
+            if chunk:
+                buf, pos = buf[pos:] + utf8.decode(chunk), 0
+                return True
+        tail = utf8.decode(b"", final=True)
+        if tail:
+            buf, pos = buf[pos:] + tail, 0
+            return True
+        return False
+
+    while True:
+        while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if not more():
+                if expect == "end":
+                    return
+                raise ValueError("truncated JSON array")
+            continue
+        c = buf[pos]
+        if expect == "end":
+            raise ValueError(f"unexpected data after the JSON array at offset {pos}")
+        if expect == "[":
+            if c != "[":
+                raise ValueError("expected a JSON array")
+            pos += 1
+            expect = "first"
+        elif c == "]" and expect in ("first", ","):
+            pos += 1
+            expect = "end"
+        elif expect == ",":
+            if c != ",":
+                raise ValueError(f"expected ',' or ']' at offset {pos}")
+            pos += 1
+            expect = "value"
+        else:
+            try:
+                value, end = scan(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                # Most likely the element isn't complete yet
+                if more():
+                    continue
+                # It isn't: let raw_decode() raise the JSONDecodeError with its position
+                decoder.raw_decode(buf, pos)
+                raise ValueError(f"invalid JSON value at offset {pos}")
+            # A number is only complete once a delimiter follows it: "1" may
+            # continue as "12", "1." as "1.5" and "1e" as "1e3" in the next chunk
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(buf) or buf[end] not in JSON_DELIMITERS) and more()):
+                continue
+            pos = end
+            expect = ","
+            yield value
+
+@dataclass(slots=True)
+class GistRecord:
+    """
+    The part of a gist the rest of the run uses, projected from an API response.
+
+    Listing pages are converted as they arrive and the raw JSON (owner object,
+    per-file raw_url/type/size maps, history URLs...) is dropped right away.
+    Only the file names and the primary language survive from the files map.
+    `engagement` holds the comments/forks/stars counts once they are known.
+    `node_id` is the gist's GraphQL global ID, used for the node() count lookups.
+    """
+    id: str
+    description: Optional[str]
+    public: bool
+    created_at: Optional[str]
+    updated_at: Optional[str]
+    html_url: Optional[str]
+    file_names: Tuple[str, ...]
+    language: str
+    engagement: Optional[Dict[str, Any]] = None
+    counts_fetched_at: Optional[float] = None
+    node_id: Optional[str] = None
+
+    @classmethod
+    def from_rest(cls, g: Dict[str, Any]) -> "GistRecord":
+        files = g.get("files") or {}
+        return cls(
+            id=g.get("id") or "",
+            description=g.get("description"),
+            public=bool(g.get("public", False)),
+            created_at=g.get("created_at"),
+            updated_at=g.get("updated_at"),
+            html_url=g.get("html_url"),
+            file_names=tuple(files),
+            language=primary_language(files),
+            node_id=g.get("node_id"),
+        )
+
+    @classmethod
+    def from_graphql(cls, node: Dict[str, Any]) -> "GistRecord":
+        """
+        Convert a GraphQL Gist node, with its engagement counts attached so the
+        per-gist REST lookups can be skipped.
+        """
+        files: Dict[str, Dict[str, Any]] = {}
+        for f in node.get("files") or []:
+            lang = (f.get("language") or {}).get("name")
+            files[f.get("name") or ""] = {"language": lang, "size": f.get("size") or 0}
+        return cls(
+            id=node.get("name", ""),
+            description=node.get("description"),
+            public=bool(node.get("isPublic")),
+            created_at=node.get("createdAt"),
+            updated_at=node.get("updatedAt"),
+            html_url=node.get("url"),
+            file_names=tuple(files),
+            language=primary_language(files),
+            engagement={
+                "comments": (node.get("comments") or {}).get("totalCount", "N/A"),
+                "forks": (node.get("forks") or {}).get("totalCount", "N/A"),
+                "stars": node.get("stargazerCount", "N/A"),
+            },
+            node_id=node.get("id"),
+        )
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "GistRecord":
+        """Rebuild a record stored by to_record(), or by older versions that kept the files map."""
+        files = record.get("files") or ()
+        return cls(
+            id=record.get("id") or "",
+            description=record.get("description"),
+            public=bool(record.get("public", False)),
+            created_at=record.get("created_at"),
+            updated_at=record.get("updated_at"),
+            html_url=record.get("html_url"),
+            file_names=tuple(files),
+            language=primary_language(files) if isinstance(files, dict) else record.get("language") or "",
+            node_id=record.get("node_id"),
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-serializable listing fields, without the counts."""
+        return {
+            "id": self.id,
+            "description": self.description,
+            "public": self.public,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "html_url": self.html_url,
+            "files": list(self.file_names),
+            "language": self.language,
+            "node_id": self.node_id,
+        }
+
+@dataclass
+class GistFilter:
+    """
+    Listing filters (FILTER_LANGUAGE, FILTER_SINCE, FILTER_UNTIL, FILTER_FILES).
+
+    Calling it with a GistRecord tells whether the gist is listed; every
+    criterion that is set must match. Languages and globs are compared
+    case-insensitively, dates against updated_at.
+    """
+
+    languages: Optional[List[str]] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    file_globs: Optional[List[str]] = None
+
+    @classmethod
+    def from_cfg(cls, cfg: Cfg) -> Optional["GistFilter"]:
+        """Filter for `cfg`, or None if no filter is configured."""
+        if not (cfg.filter_languages or cfg.filter_since or cfg.filter_until or cfg.filter_files):
+            return None
+        return cls(
+            languages=[x.lower() for x in cfg.filter_languages or []] or None,
+            since=cfg.filter_since,
+            until=cfg.filter_until,
+            file_globs=[x.lower() for x in cfg.filter_files or []] or None,
+        )
+
+    def __call__(self, g: GistRecord) -> bool:
+        if self.languages and g.language.lower() not in self.languages:
+            return False
+        updated = g.updated_at or ""
+        if self.since and updated < self.since:
+            return False
+        # A date-only bound covers the whole day
+        if self.until and updated[:len(self.until)] > self.until:
+            return False
+        if self.file_globs and not any(fnmatchcase(name.lower(), pattern)
+                                       for name in g.file_names for pattern in self.file_globs):
+            return False
+        return True
+
+def select_gists(gists: Iterable[GistRecord], keep: Optional[GistFilter] = None, limit: int = 0) -> List[GistRecord]:
+    """
+    Apply the listing filters and keep the `limit` most recently updated gists.
+
+    With a limit, selection uses heapq.nlargest(), which never holds more than
+    `limit` records however long `gists` is.
+
+    Returns:
+        Selected gists; most recently updated first when `limit` is set,
+        otherwise in their original order
+    """
+    matching = gists if keep is None else (g for g in gists if keep(g))
+    if limit:
+        return heapq.nlargest(limit, matching, key=lambda g: g.updated_at or "")
+    return list(matching)
+
+def list_public_gists(s: Session, username: str, since: Optional[str] = None,
+                      max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, keep: Optional[GistFilter] = None,
+                      limit: int = 0) -> List[GistRecord]:
+    """
+    List a user's public gists via the REST API.
+
+    The first page's Link header tells how many pages there are (rel="last"),
+    so the remaining pages are fetched concurrently in one wave instead of one
+    by one, and no request is wasted on a trailing empty page. Each page is
+    decoded incrementally while it arrives (iter_json_array()), and each gist is
+    projected into a GistRecord as soon as it is decoded, so neither the page
+    nor the raw JSON of more than one gist is ever held as Python objects.
+    Gists rejected by `keep` are dropped with it, and with a `limit` the
+    records kept so far are cut back to the newest `limit` after every page
+    (see select_gists()).
+
+    Args:
+        s: Requests session
+        username: GitHub username whose public gists to list
+        since: Optional ISO 8601 timestamp; only gists updated after it are listed
+        max_in_flight: Maximum number of pages fetched at the same time
+        keep: Optional filter applied to each page
+        limit: If set, only the `limit` most recently updated matching gists are kept
+
+    Returns:
+        List of GistRecords (most recently updated first)
+    """
+    url = f"{API}/users/{username}/gists"
+    params: Dict[str, Any] = {"per_page": 100}
+    # A FILTER_SINCE bound is enforced by GitHub too, which saves listing pages
+    if keep and keep.since:
+        bound = keep.since if "T" in keep.since else f"{keep.since}T00:00:00Z"
+        since = max(since or "", bound)
+    if since:
+        params["since"] = since
+    skipped: List[int] = []
+
+    def get_page(page: int) -> Response:
+        # Streamed, so project() can decode the page while it is still arriving
+        r = _req_with_retry(s, "GET", url, params={**params, "page": page}, stream=True)
+        if r.status_code == 404:
+            r.close()
+            logger.error(f"User '{username}' not found or gists unavailable.")
+            sys.exit(2)
+        if not r.ok:
+            r.close()
+        r.raise_for_status()
+        return r
+
+    def project(r: Response) -> List[GistRecord]:
+        # Each gist is projected as soon as it is decoded; its raw dict is dropped right away
+        try:
+            records = [GistRecord.from_rest(g) for g in iter_json_array(r.iter_content(LISTING_CHUNK_SIZE))]
+        finally:
+            r.close()
+        # Hard filter (defensive): only keep gists explicitly marked public
+        public_only = [g for g in records if g.public]
+        if len(public_only) != len(records):
+            skipped.append(len(records) - len(public_only))
+        return select_gists(public_only, keep) if keep else public_only
+
+    def collect(records: List[GistRecord]) -> None:
+        gists.extend(records)
+        if limit and len(gists) > limit:
+            gists[:] = select_gists(gists, limit=limit)
+
+    gists: List[GistRecord] = []
+    first = get_page(1)
+    collect(project(first))
+    last = _link_page(first, "last")
+    if last and last > 1:
+        logger.debug(f"Fetching gist pages 2-{last} concurrently")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, last - 1))) as pool:
+            # Project inside the workers so only the records are kept around
+            for records in pool.map(lambda page: project(get_page(page)), range(2, last + 1)):
+                collect(records)
+    else:
+        # No rel="last" (single page, or GitHub omitted it): follow rel="next" links
+        r = first
+        while (page := _link_page(r, "next")) is not None:
+            r = get_page(page)
+            collect(project(r))
+
+    if skipped:
+        logger.info(f"Skipped {sum(skipped)} non-public gist(s).")
+    return gists
+
+GIST_PAGE_QUERY = """
+query($login: String!, $cursor: String, $pageSize: Int!, $filesLimit: Int!) {
+    user(login: $login) {
+        gists(first: $pageSize, after: $cursor, privacy: PUBLIC,
+              orderBy: {field: UPDATED_AT, direction: DESC}) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+                id
+                name
+                description
+                isPublic
+                createdAt
+                updatedAt
+                url
+                stargazerCount
+                comments { totalCount }
+                forks { totalCount }
+                files(limit: $filesLimit) { name size language { name } }
+            }
+        }
+    }
+}
+"""
+
+def list_public_gists_graphql(s: Session, username: str, keep: Optional[GistFilter] = None,
+                              limit: int = 0) -> List[GistRecord]:
+    """
+    Fetch all public gists with their engagement counts in one paginated GraphQL stream.
+
+    Walks user(login).gists with cursor pagination, GRAPHQL_PAGE_SIZE gists per
+    request. Each node carries description, files, timestamps, stargazerCount,
+    comments.totalCount and forks.totalCount, so a run needs about
+    ceil(N / 100) requests instead of 2N + 2.
+
+    Gists come newest first, so paging stops as soon as `limit` matching gists
+    are collected or the page reaches gists older than the filter's `since`.
+
+    Args:
+        s: Authenticated requests session (GraphQL requires a token)
+        username: GitHub username whose public gists to fetch
+        keep: Optional filter applied to each page
+        limit: If set, stop after the `limit` most recently updated matching gists
+
+    Returns:
+        List of GistRecords, each with its engagement counts attached
+    """
+    gists: List[GistRecord] = []
+    cursor: Optional[str] = None
+    while True:
+        variables = {
+            "login": username,
+            "cursor": cursor,
+            "pageSize": GRAPHQL_PAGE_SIZE,
+            "filesLimit": GRAPHQL_FILES_LIMIT,
+        }
+        r = _req_with_retry(s, "POST", GRAPHQL_API,
+                            json={"query": GIST_PAGE_QUERY, "variables": variables})
+        r.raise_for_status()
+        body = r.json()
+        user = (body.get("data") or {}).get("user")
+        if user is None:
+            errors = "; ".join(e.get("message", "") for e in body.get("errors") or [])
+            logger.error(f"User '{username}' not found or gists unavailable. {errors}".strip())
+            sys.exit(2)
+        conn = user["gists"]
+        page = [GistRecord.from_graphql(n) for n in conn.get("nodes") or [] if n]
+        # Same defensive filter as the REST path
+        gists.extend(select_gists((g for g in page if g.public), keep))
+        logger.debug(f"Fetched {len(gists)} gists via GraphQL so far")
+        page_info = conn.get("pageInfo") or {}
+        if not page_info.get("hasNextPage"):
+            break
+        if limit and len(gists) >= limit:
+            break
+        if keep and keep.since and page and (page[-1].updated_at or "") < keep.since:
+            break
+        cursor = page_info.get("endCursor")
+
+    return gists[:limit] if limit else gists
+
+def primary_language(files: Dict[str, Dict[str, Any]]) -> str:
+    best: Optional[Tuple[str, int]] = None
+    for f in files.values():
+        lang = f.get("language")
+        size = int(f.get("size", 0) or 0)
+        if lang and (best is None or size > best[1]):
+            best = (lang, size)
+    return best[0] if best else ""
+
+def gist_node_id(gist_id: str) -> str:
+    """
+    GraphQL global node ID of a gist, built in the legacy "04:Gist<id>" form.
+
+    Only a fallback for gists whose real `node_id` is unknown (GistRecord keeps
+    the one the listing returns).
+    """
+    return base64.b64encode(f"04:Gist{gist_id}".encode()).decode()
+
+def uses_graphql_counts(session: Session) -> bool:
+    """Whether iter_enriched() gets counts from node() lookups (it needs a token) rather than REST."""
+    return "Authorization" in session.headers
+
+GIST_COUNTS_FRAGMENT = "fragment counts on Gist { stargazerCount comments { totalCount } forks { totalCount } }"
+
+@lru_cache(maxsize=8)
+def gist_counts_query(count: int) -> str:
+    """Aliased lookup of `count` gists: g0..gN node(id:) fields bound to variables $i0..$iN."""
+    params = ", ".join(f"$i{n}: ID!" for n in range(count))
+    nodes = " ".join(f"g{n}: node(id: $i{n}) {{ ...counts }}" for n in range(count))
+    return f"query({params}) {{ {nodes} }}\n{GIST_COUNTS_FRAGMENT}"
+
+def node_batch_size() -> int:
+    """Gists per lookup query: as many as GRAPHQL_NODE_BUDGET allows, at most GRAPHQL_NODE_BATCH."""
+    return max(1, min(GRAPHQL_NODE_BATCH, GRAPHQL_NODE_BUDGET // GIST_COUNTS_NODE_COST))
+
+def node_query_points(gists: Optional[int] = None) -> int:
+    """
+    GraphQL rate-limit points of one node() lookup for `gists` gists (a full
+    batch by default): one per 100 nodes requested, at least 1.
+    """
+    nodes = (node_batch_size() if gists is None else gists) * GIST_COUNTS_NODE_COST
+    return max(1, math.ceil(nodes / 100))
+
+def node_lookup_batches(gists: List[GistRecord]) -> List[int]:
+    """
+    Sizes of the node() lookups iter_enriched() sends for `gists` rendered
+    newest first: one per chunk of node_batch_size() gists that holds gists
+    without counts, however few.
+    """
+    ordered = sorted(gists, key=lambda x: x.updated_at or "", reverse=True)
+    size = node_batch_size()
+    batches = (sum(1 for g in ordered[i:i + size] if g.id and not g.engagement) for i in range(0, len(ordered), size))
+    return [n for n in batches if n]
+
+def node_lookup_cost(batches: List[int]) -> int:
+    """GraphQL rate-limit points of the node() lookups in `batches` (see node_lookup_batches())."""
+    return sum(node_query_points(n) for n in batches)
+
+def _lookup_gist_counts(session: Session, batch: List[Tuple[str, str]]) -> Dict[str, Dict[str, int | str]]:
+    """
+    One aliased node() query for a batch of (gist_id, node_id) pairs.
+
+    Returns engagement dicts for the gists GitHub resolved. Gists it couldn't
+    resolve (deleted, not visible to the token) are left out, and so is the whole
+    batch if the request fails or the run deadline has expired.
+    """
+    deadline: Optional[RunDeadline] = getattr(session, "deadline", None)
+    if not batch or (deadline and deadline.expired()):
+        return {}
+    payload = {
+        "query": gist_counts_query(len(batch)),
+        "variables": {f"i{n}": node_id for n, (_, node_id) in enumerate(batch)},
+    }
+    try:
+        r = _req_with_retry(session, "POST", GRAPHQL_API, json=payload)
+        r.raise_for_status()
+        body = r.json()
+    except Exception as e:
+        logger.warning(f"GraphQL count lookup for {len(batch)} gists failed: {e}")
+        return {}
+    if body.get("errors"):
+        # Partial errors (e.g. NOT_FOUND for one alias) still come with data for the rest
+        logger.debug("GraphQL count lookup: " + "; ".join(e.get("message", "") for e in body["errors"]))
+    data = body.get("data") or {}
+    counts = {}
+    for n, (gist_id, _) in enumerate(batch):
+        node = data.get(f"g{n}")
+        if node:
+            counts[gist_id] = {
+                "comments": (node.get("comments") or {}).get("totalCount", "N/A"),
+                "forks": (node.get("forks") or {}).get("totalCount", "N/A"),
+                "stars": node.get("stargazerCount", "N/A"),
+            }
+    return counts
+
+def iter_gist_count_batches(session: Session, batches: List[List[Tuple[str, str]]],
+                            parallel: int = GRAPHQL_NODE_PARALLEL) -> Iterator[Dict[str, Dict[str, int | str]]]:
+    """
+    Run one node() lookup per batch of (gist_id, node_id) pairs, `parallel` at a
+    time, yielding the results in batch order.
+
+    All batches are queued up front, so later ones are already in flight while
+    the caller handles the first. Empty batches yield {} without a request.
+    """
+    workers = max(1, min(parallel, sum(1 for b in batches if b)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_lookup_gist_counts, session, batch) for batch in batches]
+        for future in futures:
+            yield future.result()
+    finally:
+        # The caller may stop early; don't start lookups nobody will read
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def get_gist_counts_batch(session: Session, gist_ids: List[str], parallel: int = GRAPHQL_NODE_PARALLEL,
+                          node_ids: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, int | str]]:
+    """
+    Get stars, comments and forks for any set of gists with batched GraphQL node() lookups.
+
+    The IDs are split into chunks of node_batch_size() (sized so each query stays
+    within GRAPHQL_NODE_BUDGET), each chunk becomes one aliased query, and up to
+    `parallel` queries run at once: ceil(N / 100) requests for N gists, whoever
+    owns them. Requires an authenticated session.
+
+    Args:
+        session: Authenticated requests session
+        gist_ids: Gist IDs to look up, in any order
+        parallel: Maximum number of lookup queries in flight
+        node_ids: GraphQL node IDs by gist ID (from the listing); gist_node_id()
+            builds the ones that are missing
+
+    Returns:
+        Dictionary mapping gist_id -> {"comments", "forks", "stars"} for the gists
+        GitHub resolved; unresolved gists and failed chunks are left out
+    """
+    node_ids = node_ids or {}
+    pairs = [(gist_id, node_ids.get(gist_id) or gist_node_id(gist_id)) for gist_id in gist_ids]
+    size = node_batch_size()
+    batches = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    counts: Dict[str, Dict[str, int | str]] = {}
+    for result in iter_gist_count_batches(session, batches, parallel):
+        counts.update(result)
+    return counts
+
+def _count_items(session: Session, url: str) -> int | str:
+    """
+    Count the items of a gist sub-resource endpoint (comments or forks).
+
+    Asks for one item per page, so the page number of the Link rel="last" entry
+    is the exact count and at most one comment or fork is downloaded. Without
+    rel="last" the single page holds every item (0 or 1). Only if GitHub links a
+    next page but no last one are the pages walked in full, 100 items at a time.
+
+    Returns 0 for non-200 responses and "N/A" if the request ultimately fails.
+    """
+    try:
+        r = _req_with_retry(session, "GET", url, params={"per_page": 1})
+        if r.status_code != 200:
+            return 0
+        last = _link_page(r, "last")
+        if last is not None:
+            return last
+        if _link_page(r, "next") is None:
+            return len(r.json())
+        # Fallback: count every item, following rel="next"
+        logger.debug(f"No rel=\"last\" link for {url}; paging through all items")
+        total, page = 0, 1
+        while page is not None:
+            r = _req_with_retry(session, "GET", url, params={"per_page": 100, "page": page})
+            r.raise_for_status()
+            total += len(r.json())
+            page = _link_page(r, "next")
+        return total
+    except RateLimitDeadline:
+        raise
+    except Exception as e:
+        logger.debug(f"Failed to fetch {url}: {e}")
+        return "N/A"
+
+def fetch_engagement_counts(session: Session, gist_ids: List[str], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> Dict[str, Tuple[int | str, int | str]]:
+    """
+    Fetch comment and fork counts for many gists concurrently.
+
+    Every gist needs two REST calls (comments and forks). Instead of issuing them
+    one after another, they are dispatched to a bounded thread pool that shares
+    the session's connection pool, so at most `max_in_flight` requests are
+    outstanding at any time. Each call goes through _req_with_retry.
+
+    Args:
+        session: Authenticated requests session
+        gist_ids: List of gist IDs to enrich
+        max_in_flight: Maximum number of concurrent requests
+
+    With a RUN_DEADLINE on the session, lookups not yet started when it
+    expires, or that the rate limit would hold past it, are skipped, and their
+    gists are left out of the result.
+
+    Returns:
+        Dictionary mapping gist_id -> (comments, forks); a count is "N/A" if unavailable
+    """
+    if not gist_ids:
+        return {}
+    deadline: Optional[RunDeadline] = getattr(session, "deadline", None)
+
+    def count(url: str) -> Optional[int | str]:
+        if deadline and deadline.expired():
+            return None
+        try:
+            return _count_items(session, url)
+        except RateLimitDeadline:
+            return None
+
+    urls = []
+    for gist_id in gist_ids:
+        urls.append(f"{API}/gists/{gist_id}/comments")
+        urls.append(f"{API}/gists/{gist_id}/forks")
+
+    workers = max(1, min(max_in_flight, len(urls)))
+    logger.debug(f"Fetching comments and forks for {len(gist_ids)} gists ({workers} in flight)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() preserves input order, so results line up with urls
+        results = list(pool.map(count, urls))
+
+    return {
+        gist_id: (results[2 * i], results[2 * i + 1])
+        for i, gist_id in enumerate(gist_ids)
+        if results[2 * i] is not None and results[2 * i + 1] is not None
+    }
+
+def iter_enriched(gists: List[GistRecord], session: Session, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                  chunk_size: int = ENRICH_CHUNK_SIZE, stale: Optional["StaleReport"] = None) -> Iterator[GistRecord]:
+    """
+    Yield gists in their original order, each with its engagement counts attached.
+
+    With a token, counts come from batched GraphQL node() lookups
+    (node_batch_size() gists per query, at most `max_in_flight` and
+    GRAPHQL_NODE_PARALLEL queries in flight); gists the lookup couldn't resolve
+    fall back to REST. Without one, comments and forks are fetched concurrently
+    over REST, `chunk_size` gists at a time, and stars are "N/A". Either way
+    each chunk is yielded as soon as its lookups finish, so rendering can start
+    before the whole list is enriched.
+
+    Once the session's RUN_DEADLINE expires, no more lookups are started: the
+    remaining gists get their counts from `stale` (last-known counts, recorded
+    as stale rows) or "N/A", so the list is still complete.
+    """
+    use_graphql = uses_graphql_counts(session)
+    size = node_batch_size() if use_graphql else chunk_size
+    chunks = [gists[start:start + size] for start in range(0, len(gists), size)]
+    pending = [[g.id for g in chunk if g.id and not g.engagement] for chunk in chunks]
+    if use_graphql and any(pending):
+        logger.info(f"Fetching counts for {sum(map(len, pending))} gists via GraphQL...")
+        batches = [[(g.id, g.node_id or gist_node_id(g.id)) for g in chunk if g.id and not g.engagement]
+                   for chunk in chunks]
+        lookups: Iterator[Dict[str, Dict[str, int | str]]] = iter_gist_count_batches(
+            session, batches, min(max_in_flight, GRAPHQL_NODE_PARALLEL))
+    else:
+        lookups = iter({} for _ in chunks)
+
+    for chunk, chunk_ids in zip(chunks, pending):
+        with _phase(session, "enrich"):
+            engagement = next(lookups)
+            # Comments and forks over REST for whatever GraphQL didn't resolve
+            missing = [gist_id for gist_id in chunk_ids if gist_id not in engagement]
+            for gist_id, (comments, forks) in fetch_engagement_counts(session, missing, max_in_flight).items():
+                engagement[gist_id] = {"comments": comments, "forks": forks, "stars": "N/A"}
+
+        for g in chunk:
+            gist_id = g.id
+            if gist_id in engagement and not g.engagement:
+                g.engagement = engagement[gist_id]
+            elif gist_id in chunk_ids:
+                # Skipped because the run deadline expired
+                if stale is not None:
+                    stale.degrade(g)
+                else:
+                    g.engagement = {"comments": "N/A", "forks": "N/A", "stars": "N/A"}
+            yield g
+
+class RowFormatter:
+    """
+    Turns gist records into table rows, compiled once from the display settings.
+
+    The timezone object, the strftime pattern (date format, time format and zone
+    abbreviation) and the row template for the chosen table style are worked out
+    in the constructor, so the per-row work is just field extraction, one cached
+    timestamp conversion per date and one f-string.
+    """
+
+    HTML_HEADER = (
+        "<table>",
+        "<tr>",
+        "<th>Title</th><th>Files</th><th>File Names</th><th>Lang</th><th>Public</th><th>Created</th><th>Updated</th><th>Link</th><th>Comments</th><th>Forks</th><th>Stars</th>",
+        "</tr>",
+    )
+    MARKDOWN_HEADER = (
+        "| Title | Description | Files | File Names | Lang | Public | Created | Updated | Link | Comments | Forks | Stars |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|",
+    )
+
+    def __init__(self, timezone: str = "UTC", date_format: str = "YYYY-MM-DD", time_format: str = "24", use_html_table: bool = False) -> None:
+        try:
+            self.tz = ZoneInfo(timezone)
+        except Exception as e:
+            logger.warning(f"Invalid timezone '{timezone}', falling back to UTC: {e}")
+            self.tz = ZoneInfo("UTC")
+
+        # Convert date and time formats to a single strftime pattern with the zone abbreviation
+        date_strftime = date_format.replace("YYYY", "%Y").replace("MM", "%m").replace("DD", "%d")
+        time_strftime = "%I:%M %p" if time_format == "12" else "%H:%M"
+        self.strftime = f"{date_strftime} {time_strftime} %Z"
+
+        self.use_html_table = use_html_table
+        self.rows = self._html_rows if use_html_table else self._markdown_rows
+        # Created and updated timestamps often coincide; convert each distinct value once
+        self.format_timestamp = lru_cache(maxsize=4096)(self._format_timestamp)
+
+    def now(self) -> str:
+        """Current time in the configured timezone and format."""
+        return datetime.now(self.tz).strftime(self.strftime)
+
+    def header(self) -> Tuple[str, ...]:
+        return self.HTML_HEADER if self.use_html_table else self.MARKDOWN_HEADER
+
+    def head(self, username: str, count: int) -> Iterator[str]:
+        """Document title, timestamp and total, then the table header."""
+        yield from _document_head(self, f"All public gists from {username}", count)
+        yield from self.header()
+
+    def tail(self, username: str) -> Iterator[str]:
+        return _document_tail(self, username)
+
+    def footer(self) -> Tuple[str, ...]:
+        return ("</table>",) if self.use_html_table else ()
+
+    def _format_timestamp(self, raw: Optional[str]) -> str:
+        try:
+            dt_utc = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+            return dt_utc.astimezone(self.tz).strftime(self.strftime)
+        except Exception as e:
+            logger.warning(f"Failed to format gist date '{raw}': {e}")
+            return raw or ""
+
+    def _fields(self, g: GistRecord) -> Tuple[Any, ...]:
+        desc = (g.description or "").strip() or "(no description)"
+        title = desc.splitlines()[0][:120]
+
+        # Format file names (show first 3, with "+N more" if there are more)
+        names = g.file_names
+        file_names_str = ", ".join([*names[:3], f"+{len(names) - 3} more"] if len(names) > 3 else names)
+
+        created = self.format_timestamp(g.created_at)
+        updated = self.format_timestamp(g.updated_at)
+
+        # Engagement counts attached by iter_enriched()
+        known = g.engagement or {}
+        public_flag = '✓' if g.public else '✗'
+        return (title, desc, len(names), file_names_str, g.language, public_flag, created, updated,
+                g.html_url or "", known.get("comments", "N/A"), known.get("forks", "N/A"),
+                known.get("stars", "N/A"))
+
+    def _html_rows(self, g: GistRecord) -> Iterator[str]:
+        title, desc, n, names, lang, public, created, updated, url, comments, forks, stars = self._fields(g)
+        yield f"<tr><td>{title}</td><td>{n}</td><td>{names}</td><td>{lang}</td><td>{public}</td><td>{created}</td><td>{updated}</td><td><a href='{url}'>open</a></td><td>{comments}</td><td>{forks}</td><td>{stars}</td></tr>"
+        # Full description on a separate row below (spanning all columns)
+        if desc != "(no description)":
+            yield f"<tr><td colspan='11'><strong>Description:</strong> {desc}</td></tr>"
+
+    def _markdown_rows(self, g: GistRecord) -> Iterator[str]:
+        title, desc, n, names, lang, public, created, updated, url, comments, forks, stars = self._fields(g)
+        # Truncate description for markdown tables to prevent width issues
+        desc_truncated = desc[:50] + "..." if len(desc) > 50 else desc
+        yield f"| {title} | {desc_truncated} | {n} | {names} | {lang} | {public} | {created} | {updated} | [open]({url}) | {comments} | {forks} | {stars} |"
+
+def export_fields(g: GistRecord) -> Dict[str, Any]:
+    """
+    Machine-readable fields of an enriched gist, for the JSON and CSV formats.
+
+    Timestamps stay in GitHub's ISO 8601 UTC form; counts that couldn't be
+    fetched are None instead of "N/A".
+    """
+    desc = (g.description or "").strip()
+    known = g.engagement or {}
+    counts = {key: known.get(key) if isinstance(known.get(key), int) else None for key in ("comments", "forks", "stars")}
+    return {
+        "id": g.id,
+        "title": desc.splitlines()[0][:120] if desc else "",
+        "description": desc,
+        "files": list(g.file_names),
+        "language": g.language,
+        "public": g.public,
+        "created_at": g.created_at,
+        "updated_at": g.updated_at,
+        "url": g.html_url,
+        **counts,
+    }
+
+class JsonFormatter:
+    """
+    Renders the list as one JSON document, one gist object per line.
+
+    Same interface as RowFormatter (head(), rows(), tail()), so the document is
+    streamed like the tables. Each row is held back until the next one arrives,
+    so only the last gist goes without a trailing comma.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Optional[str] = None
+
+    def head(self, username: str, count: int) -> Iterator[str]:
+        yield "{"
+        yield f'  "username": {json.dumps(username)},'
+        yield f'{GENERATED_AT_PREFIX} "{datetime.now(ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ")}",'
+        yield f'  "total": {count},'
+        yield '  "gists": ['
+
+    def rows(self, g: GistRecord) -> Iterator[str]:
+        if self.pending is not None:
+            yield self.pending + ","
+        self.pending = "    " + json.dumps(export_fields(g), ensure_ascii=False)
+
+    def tail(self, username: str) -> Iterator[str]:
+        if self.pending is not None:
+            yield self.pending
+            self.pending = None
+        yield "  ]"
+        yield "}"
+
+class CsvFormatter:
+    """Renders the list as CSV with a header row; file names are joined with ";"."""
+
+    COLUMNS = ("id", "title", "description", "files", "language", "public", "created_at", "updated_at",
+               "url", "comments", "forks", "stars")
+
+    def __init__(self) -> None:
+        self.buf = io.StringIO()
+        # "\n" as terminator makes the writer quote descriptions that span lines
+        self.writer = csv.writer(self.buf, lineterminator="\n")
+
+    def _line(self, values: Iterable[Any]) -> str:
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.writer.writerow(values)
+        return self.buf.getvalue()[:-1]
+
+    def head(self, username: str, count: int) -> Iterator[str]:
+        yield self._line(self.COLUMNS)
+
+    def rows(self, g: GistRecord) -> Iterator[str]:
+        fields = export_fields(g)
+        fields["files"] = ";".join(fields["files"])
+        fields["public"] = "true" if fields["public"] else "false"
+        yield self._line("" if fields[c] is None else fields[c] for c in self.COLUMNS)
+
+    def tail(self, username: str) -> Iterator[str]:
+        return iter(())
+
+def make_formatter(name: str, timezone: str = "UTC", date_format: str = "YYYY-MM-DD", time_format: str = "24") -> Any:
+    """Formatter for one of config.OUTPUT_FORMAT_NAMES."""
+    if name == "json":
+        return JsonFormatter()
+    if name == "csv":
+        return CsvFormatter()
+    return RowFormatter(timezone, date_format, time_format, use_html_table=name == "html")
+
+def format_filename(target_md: str, name: str, primary: bool = False) -> str:
+    """
+    Filename of one output format next to `target_md`.
+
+    The primary table format keeps `target_md` itself; a secondary table gets a
+    suffix (Public-gists-html.md) and JSON/CSV swap the extension (Public-gists.json).
+    """
+    stem, ext = os.path.splitext(target_md)
+    if name in ("json", "csv"):
+        return f"{stem}.{name}"
+    return target_md if primary else f"{stem}-{name}{ext or '.md'}"
+
+def iter_documents(gists: List[GistRecord], username: str, session: Session, formatters: Dict[str, Any],
+                   max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, stale: Optional[StaleReport] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Render the gist list in several formats from one enrichment pass.
+
+    This is the renderer run_pipeline() uses. Every formatter (see
+    make_formatter()) gets the document head (title, "Last updated" timestamp,
+    total, table header), then one row per gist, newest update first, as soon
+    as the enrichment chunk holding the gist has finished, then the tail. Each
+    gist is enriched once no matter how many formats are rendered, and the
+    document is never held in memory. `stale` collects the gists left
+    unrefreshed by a RUN_DEADLINE (see iter_enriched()).
+
+    The markdown and HTML tables (RowFormatter) have these columns: Title
+    (first line of the description, at most 120 chars), Files, File Names
+    (first 3, then "+N more"), Lang (primary language by largest file), Public,
+    Created, Updated (in the configured timezone), Link, Comments, Forks and
+    Stars. Gists with a description get a second row holding all of it.
+
+    Yields:
+        (format name, line) pairs; lines of one format keep their order
+    """
+    for name, fmt in formatters.items():
+        for line in fmt.head(username, len(gists)):
+            yield name, line
+    gists_sorted = sorted(gists, key=lambda x: x.updated_at or "", reverse=True)
+    for g in iter_enriched(gists_sorted, session, max_in_flight, stale=stale):
+        for name, fmt in formatters.items():
+            for line in fmt.rows(g):
+                yield name, line
+    for name, fmt in formatters.items():
+        for line in fmt.tail(username):
+            yield name, line
+
+def _document_head(fmt: RowFormatter, title: str, count: int) -> Iterator[str]:
+    yield f"# {title}"
+    yield ""
+    yield f"{TIMESTAMP_PREFIX} " + fmt.now()
+    yield ""
+    yield f"**Total public gists:** {count}"
+    yield ""
+
+def _document_tail(fmt: RowFormatter, username: str) -> Iterator[str]:
+    yield from fmt.footer()
+    yield ""
+    yield f"_List created by [Make Gist List](https://github.com/{username}/Make-Gist-List)._"
+
+def shard_filename(target_md: str, label: str) -> str:
+    """Name of a shard file next to the index, e.g. Public-gists.md -> Public-gists-2024.md."""
+    stem, ext = os.path.splitext(target_md)
+    return f"{stem}-{label}{ext or '.md'}"
+
+def managed_file_pattern(target_md: str) -> re.Pattern:
+    """Regex matching every file a run can write next to `target_md` (shards, other formats, stale report)."""
+    stem, ext = os.path.splitext(target_md)
+    return re.compile(rf"{re.escape(stem)}(?:-(?:\d{{4}}|unknown|page-\d+|markdown|html|stale){re.escape(ext or '.md')}|\.json|\.csv)")
+
+def gist_file_anchor(filename: str) -> str:
+    """Fragment GitHub uses for a file on a gist page, e.g. Public-gists-2024.md -> #file-public-gists-2024-md."""
+    return "#file-" + re.sub(r"[^a-z0-9]+", "-", filename.lower()).strip("-")
+
+def shard_gists(gists: List[GistRecord], shard_by: str, shard_size: int = DEFAULT_SHARD_SIZE) -> List[Tuple[str, List[GistRecord]]]:
+    """
+    Split gists into labelled shards, newest shard first.
+
+    Shards are keyed on the creation date, which never changes, so a gist stays
+    in the same shard when it is edited and an update only touches one file:
+
+    - "year": one shard per creation year ("2024", ...)
+    - "page": pages of `shard_size` gists numbered from the oldest ("page-001", ...),
+      so only the newest page grows as gists are added
+
+    Returns:
+        List of (label, gists) pairs
+    """
+    if shard_by == "year":
+        groups: Dict[str, List[GistRecord]] = {}
+        for g in gists:
+            year = (g.created_at or "")[:4]
+            groups.setdefault(year if year.isdigit() else "unknown", []).append(g)
+        return sorted(groups.items(), key=lambda item: (item[0] != "unknown", item[0]), reverse=True)
+
+    by_age = sorted(gists, key=lambda g: g.created_at or "")
+    pages = [by_age[i:i + shard_size] for i in range(0, len(by_age), shard_size)]
+    return [(f"page-{n:03d}", pages[n - 1]) for n in range(len(pages), 0, -1)]
+
+def build_markdown_shards(gists: List[GistRecord], username: str, session: Session, target_md: str,
+                          shard_by: str = "year", shard_size: int = DEFAULT_SHARD_SIZE, timezone: str = "UTC",
+                          date_format: str = "YYYY-MM-DD", time_format: str = "24", use_html_table: bool = False,
+                          max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, stale: Optional[StaleReport] = None) -> Dict[str, str]:
+    """
+    Build the gist list split into shard files plus an index file.
+
+    Each shard is a complete document in the same layout as iter_documents(),
+    holding the gists of one shard_gists() group. The index is written to
+    `target_md` and links every shard with its gist count and latest update.
+    All gists are enriched in one iter_enriched() pass (one star-count query),
+    with rows routed to their shard as they arrive; `stale` is passed on to it.
+
+    Returns:
+        Mapping of filename to content, index first, then shards newest first
+    """
+    fmt = RowFormatter(timezone, date_format, time_format, use_html_table)
+    shards = shard_gists(gists, shard_by, shard_size)
+
+    bodies: Dict[str, List[str]] = {}
+    shard_of: Dict[int, str] = {}
+    for label, members in shards:
+        name = shard_filename(target_md, label)
+        bodies[name] = [*_document_head(fmt, f"Public gists from {username}: {label}", len(members)), *fmt.header()]
+        shard_of.update((id(g), name) for g in members)
+
+    gists_sorted = sorted(gists, key=lambda x: x.updated_at or "", reverse=True)
+    for g in iter_enriched(gists_sorted, session, max_in_flight, stale=stale):
+        bodies[shard_of[id(g)]].extend(fmt.rows(g))
+
+    index = [*_document_head(fmt, f"All public gists from {username}", len(gists)),
+             "| Shard | Gists | Last updated |",
+             "|---|---|---|"]
+    for label, members in shards:
+        name = shard_filename(target_md, label)
+        latest = max((g.updated_at or "" for g in members), default="")
+        index.append(f"| [{label}]({gist_file_anchor(name)}) | {len(members)} | {fmt.format_timestamp(latest) if latest else ''} |")
+    index.extend(["", f"_List created by [Make Gist List](https://github.com/{username}/Make-Gist-List)._"])
+
+    files = {target_md: "\n".join(index) + "\n"}
+    for name, lines in bodies.items():
+        files[name] = "\n".join([*lines, *_document_tail(fmt, username)]) + "\n"
+    return files
+
+class GistStateStore:
+    """
+    SQLite-backed state for incremental runs, keyed by gist id.
+
+    Each row records the gist's updated_at, the fields the renderer needs and
+    the last-known comment/fork/star counts together with when they were fetched.
+    On the next run, gists whose updated_at is unchanged and whose counts are
+    younger than the TTL are restored from the store instead of re-enriched.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS gists (
+        id TEXT PRIMARY KEY,
+        updated_at TEXT,
+        record TEXT NOT NULL,
+        comments INTEGER,
+        forks INTEGER,
+        stars INTEGER,
+        counts_fetched_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, path: str) -> None:
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def listing_since(self, ttl_hours: int) -> Optional[str]:
+        """
+        `since` timestamp for an incremental listing, or None if a full listing is due.
+
+        A full listing is needed when there is no previous one or it is older than
+        `ttl_hours`; it is the only way to notice deleted or now-private gists.
+        """
+        last_full = self.get_meta("last_full_listing")
+        last = self.get_meta("last_listing")
+        if not last_full or not last or time.time() - float(last_full) > ttl_hours * 3600:
+            return None
+        since = float(last) - LISTING_SKEW_SECONDS
+        return datetime.fromtimestamp(since, ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def record_listing(self, started: float, full: bool) -> None:
+        self.set_meta("last_listing", str(started))
+        if full:
+            self.set_meta("last_full_listing", str(started))
+
+    def merge_listing(self, changed: List[GistRecord]) -> List[GistRecord]:
+        """
+        Combine stored records with the gists returned by an incremental listing.
+
+        Stored records come back without their counts; restore_fresh() decides
+        which of them can reuse stored counts.
+        """
+        merged = {}
+        for gist_id, g in self.load_all().items():
+            g.engagement = g.counts_fetched_at = None
+            merged[gist_id] = g
+        for g in changed:
+            merged[g.id] = g
+        return list(merged.values())
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "GistStateStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def load_all(self) -> Dict[str, GistRecord]:
+        """Return every stored gist as a GistRecord with its stored counts, keyed by id."""
+        out: Dict[str, GistRecord] = {}
+        for gist_id, record, comments, forks, stars, fetched_at in self.conn.execute(
+            "SELECT id, record, comments, forks, stars, counts_fetched_at FROM gists"
+        ):
+            g = GistRecord.from_record(json.loads(record))
+            g.engagement = {
+                "comments": "N/A" if comments is None else comments,
+                "forks": "N/A" if forks is None else forks,
+                "stars": "N/A" if stars is None else stars,
+            }
+            g.counts_fetched_at = fetched_at
+            out[gist_id] = g
+        return out
+
+    def restore_fresh(self, gists: List[GistRecord], ttl_hours: int) -> int:
+        """
+        Attach stored counts to gists that haven't changed since the last run.
+
+        A gist is considered fresh when its updated_at matches the stored value,
+        its comment and fork counts are known and they were fetched less than
+        `ttl_hours` ago. Stars may be "N/A" (only GraphQL knows them, and it needs
+        a token), so a missing star count alone doesn't force a refresh.
+
+        Returns:
+            Number of gists restored from the store
+        """
+        stored = self.load_all()
+        cutoff = time.time() - ttl_hours * 3600
+        restored = 0
+        for g in gists:
+            prev = stored.get(g.id)
+            if not prev or g.engagement:
+                continue
+            if prev.updated_at != g.updated_at:
+                continue
+            known = prev.engagement
+            if (prev.counts_fetched_at or 0) < cutoff or "N/A" in (known["comments"], known["forks"]):
+                continue
+            g.engagement = known
+            restored += 1
+        return restored
+
+    def save(self, gists: List[GistRecord], fetched_ids: Optional[set] = None, prune: bool = True) -> None:
+        """
+        Upsert gist records and counts.
+
+        Args:
+            gists: Enriched gist records
+            fetched_ids: IDs whose counts were fetched during this run; only those
+                get a new counts_fetched_at timestamp (None means all of them)
+            prune: If True, delete stored gists that are not in `gists`
+        """
+        now = time.time()
+
+        def count(v: Any) -> Optional[int]:
+            return v if isinstance(v, int) else None
+
+        with self.conn:
+            for g in gists:
+                gist_id = g.id
+                if not gist_id:
+                    continue
+                e = g.engagement or {}
+                fresh = fetched_ids is None or gist_id in fetched_ids
+                self.conn.execute(
+                    """
+                    INSERT INTO gists (id, updated_at, record, comments, forks, stars, counts_fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        updated_at = excluded.updated_at,
+                        record = excluded.record,
+                        comments = CASE WHEN ? THEN excluded.comments ELSE comments END,
+                        forks = CASE WHEN ? THEN excluded.forks ELSE forks END,
+                        stars = CASE WHEN ? THEN excluded.stars ELSE stars END,
+                        counts_fetched_at = CASE WHEN ? THEN excluded.counts_fetched_at ELSE counts_fetched_at END
+                    """,
+                    (gist_id, g.updated_at, json.dumps(g.to_record()),
+                     count(e.get("comments")), count(e.get("forks")), count(e.get("stars")), now,
+                     fresh, fresh, fresh, fresh),
+                )
+            if prune:
+                ids = [g.id for g in gists if g.id]
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (id TEXT PRIMARY KEY)")
+                self.conn.execute("DELETE FROM keep")
+                self.conn.executemany("INSERT OR IGNORE INTO keep (id) VALUES (?)", [(i,) for i in ids])
+                self.conn.execute("DELETE FROM gists WHERE id NOT IN (SELECT id FROM keep)")
+
+def fetch_rate_budget(s: Session, scheduler: RateLimitScheduler) -> None:
+    """
+    Seed `scheduler` with the core and GraphQL budgets from GET /rate_limit.
+
+    The call itself is free. Without it the GraphQL budget is unknown until the
+    first GraphQL request, so RATE_LIMIT_POLICY couldn't act on it. A failure
+    is logged and leaves the budgets as they were.
+    """
+    try:
+        # Never answered from the HTTP cache: a 304 would bring back old numbers
+        r = _req_with_retry(s, "GET", f"{API}/rate_limit", headers={"Cache-Control": "no-cache"})
+        r.raise_for_status()
+        scheduler.seed(r.json().get("resources") or {})
+    except Exception as e:
+        logger.debug(f"Could not read the rate limit status: {e}")
+
+def publish_file_count(cfg: Cfg, gists: List[GistRecord]) -> int:
+    """
+    Files a run writes to the target gist at most: one per output format, one
+    per shard with SHARD_BY (the index is the primary format's file) and the
+    stale-rows report with RUN_DEADLINE.
+    """
+    formats = output_formats(cfg)
+    count = len(formats)
+    if cfg.shard_by != "none" and formats[0] in ("markdown", "html"):
+        count += len(shard_gists(gists, cfg.shard_by, cfg.shard_size))
+    return count + (1 if cfg.run_deadline else 0)
+
+def estimate_run_cost(gists: List[GistRecord], publish_files: int = 0, graphql: bool = False) -> Dict[str, int]:
+    """
+    Upper bound on the rate budget still needed after listing, per rate-limit resource.
+
+    Only gists without counts cost anything. With `graphql` (a token) they are
+    covered by node() lookups, costing node_lookup_cost() GraphQL points for the
+    batches iter_enriched() will send; without it each costs two REST calls
+    (comments and forks). Publishing `publish_files` files (0 = not publishing)
+    costs REST calls either way: a GET of the target gist, a read of every file
+    the API returns truncated, and the PATCH. Conditional requests answered
+    with 304 make the real cost lower.
+    """
+    pending = sum(1 for g in gists if g.id and not g.engagement)
+    return {
+        "core": (0 if graphql else 2 * pending) + (2 + publish_files if publish_files else 0),
+        "graphql": node_lookup_cost(node_lookup_batches(gists)) if graphql else 0,
+    }
+
+def affordable_node_lookups(gists: List[GistRecord], points: int) -> int:
+    """
+    How many gists without counts, newest first, the node() lookups can cover
+    with `points` GraphQL points. Lookups go out per chunk of node_batch_size()
+    gists, so a chunk with few pending gists still costs a whole query.
+    """
+    affordable = 0
+    for batch in node_lookup_batches(gists):
+        if node_query_points(batch) <= points:
+            points -= node_query_points(batch)
+            affordable += batch
+            continue
+        # The last query can still carry as many gists as the points left pay for
+        if points > 0:
+            affordable += min(batch, points * 100 // GIST_COUNTS_NODE_COST)
+        break
+    return affordable
+
+def fit_to_rate_budget(gists: List[GistRecord], scheduler: RateLimitScheduler, publish_files: int,
+                       reserve: int, stored: Optional[Dict[str, GistRecord]] = None,
+                       graphql: bool = False) -> Optional[List[str]]:
+    """
+    Degrade enrichment so the run fits in the remaining rate budget.
+
+    Each budget is charged separately (see estimate_run_cost()). Enrichment is
+    fitted to the budget it uses: with `graphql` the GraphQL points for the
+    node() lookups (see affordable_node_lookups()), without it the REST budget
+    minus `reserve` and what publishing needs. Only the most recently updated
+    pending gists that budget covers are left to enrich; the others get their
+    last-known counts from `stored` (the incremental state) or "N/A". With
+    `graphql`, a REST budget too small to publish is only reported, since
+    skipping lookups doesn't save REST calls.
+
+    Seed the scheduler first (fetch_rate_budget()); an unknown budget is not
+    charged.
+
+    Returns:
+        IDs of the gists that were degraded, or None if the budget covers the run
+        or is unknown
+    """
+    pending = [g for g in gists if g.id and not g.engagement]
+    cost = estimate_run_cost(gists, publish_files, graphql)
+    core, points = scheduler.remaining("core"), scheduler.remaining("graphql")
+    logger.debug(f"Estimated run cost: {cost}, remaining: core {core}, graphql {points}")
+    if graphql:
+        if core is not None and cost["core"] > core - reserve:
+            logger.warning(f"Publishing needs ~{cost['core']} REST requests but only {core} remain "
+                           f"(reserve {reserve}); it will wait for the rate limit to reset")
+        if points is None or cost["graphql"] <= points:
+            return None
+        affordable = affordable_node_lookups(gists, points)
+    else:
+        if core is None or cost["core"] <= core - reserve:
+            return None
+        affordable = max(0, (core - reserve - estimate_run_cost([], publish_files)["core"]) // 2)
+    pending.sort(key=lambda g: g.updated_at or "", reverse=True)
+    skipped = pending[affordable:]
+    stored = stored or {}
+    for g in skipped:
+        prev = stored.get(g.id)
+        g.engagement = dict(prev.engagement) if prev else {"comments": "N/A", "forks": "N/A", "stars": "N/A"}
+    logger.warning(f"Rate budget covers {affordable} of {len(pending)} gists; "
+                   f"using last-known or N/A counts for {len(skipped)}")
+    return [g.id for g in skipped]
+
+class StaleReport:
+    """
+    Rows whose counts couldn't be refreshed before RUN_DEADLINE expired.
+
+    degrade() gives such a gist its last-known counts from the state store
+    (loaded on first use) or "N/A", and records it. lines() renders the report
+    published next to the list, so readers can tell which counts are old.
+    """
+
+    def __init__(self, last_known: Optional[Callable[[], Dict[str, GistRecord]]] = None) -> None:
+        self.last_known = last_known
+        self.known: Optional[Dict[str, GistRecord]] = None
+        self.rows: List[Tuple[GistRecord, Optional[float]]] = []
+
+    def degrade(self, g: GistRecord) -> None:
+        if self.known is None:
+            self.known = self.last_known() if self.last_known else {}
+        prev = self.known.get(g.id)
+        if prev and prev.engagement:
+            g.engagement = dict(prev.engagement)
+            self.rows.append((g, prev.counts_fetched_at))
+        else:
+            g.engagement = {"comments": "N/A", "forks": "N/A", "stars": "N/A"}
+            self.rows.append((g, None))
+
+    def ids(self) -> set:
+        return {g.id for g, _ in self.rows}
+
+    def lines(self, username: str) -> Iterator[str]:
+        utc = ZoneInfo("UTC")
+        yield f"# Stale rows in the gist list of {username}"
+        yield ""
+        yield f"{TIMESTAMP_PREFIX} {datetime.now(utc).strftime('%Y-%m-%d %H:%M %Z')}"
+        yield ""
+        yield (f"The run deadline was reached before the counts of {len(self.rows)} gist(s) could be refreshed. "
+               "They show their last-known counts, or N/A where none were stored.")
+        yield ""
+        yield "| Gist | Counts as of |"
+        yield "|---|---|"
+        for g, fetched_at in self.rows:
+            title = ((g.description or "").strip() or "(no description)").splitlines()[0][:120]
+            when = datetime.fromtimestamp(fetched_at, utc).strftime("%Y-%m-%d %H:%M %Z") if fetched_at else "N/A"
+            yield f"| [{title}]({g.html_url or ''}) | {when} |"
+
+def write_routed(pairs: Iterable[Tuple[str, str]], sinks: Dict[str, List[TextIO]]) -> int:
+    """
+    Write rendered lines to their format's sinks as they are produced.
+
+    `pairs` come from iter_documents(). Every line is newline-terminated, so a
+    single format's output is a complete document. Nothing is
+    accumulated in memory.
+
+    Returns:
+        Number of lines written
+    """
+    n = 0
+    for name, line in pairs:
+        chunk = line + "\n"
+        for sink in sinks.get(name, ()):
+            sink.write(chunk)
+        n += 1
+    return n
+
+def write_output_files(files: Dict[str, str], target_md: str, output_file: Optional[str], echo: bool) -> None:
+    """
+    Write multi-file output (shards) locally.
+
+    With `output_file`, the `target_md` file goes to that path and every other
+    file to a file of the same name as in the gist, in the same directory.
+    Otherwise, if `echo`, the files are printed to stdout one after another.
+    """
+    if output_file:
+        folder = os.path.dirname(output_file)
+        for name, content in files.items():
+            path = output_file if name == target_md else os.path.join(folder, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+    elif echo:
+        for content in files.values():
+            sys.stdout.write(content)
+
+def content_fingerprint(content_md: str) -> str:
+    """
+    Hash the generated content, ignoring the "Last updated" timestamp line.
+
+    The timestamp changes on every run, so two documents that only differ there
+    get the same fingerprint and the upload can be skipped. The "generated_at"
+    line of the JSON format is ignored the same way.
+    """
+    h = hashlib.sha256()
+    for line in content_md.splitlines():
+        if not line.startswith((TIMESTAMP_PREFIX, GENERATED_AT_PREFIX)):
+            h.update(line.encode("utf-8"))
+            h.update(b"\n")
+    return h.hexdigest()
+
+def fetch_gist(s: Session, gist_id: str) -> Dict[str, Any]:
+    """
+    Fetch a gist's JSON.
+
+    The GET goes through the session's conditional request cache, so an unchanged
+    gist costs a 304.
+
+    Raises:
+        SystemExit: If gist not found or token lacks access
+    """
+    r = _req_with_retry(s, "GET", f"{API}/gists/{gist_id}")
+    if r.status_code == 404:
+        logger.error("LIST_GIST_ID not found or token lacks access to that gist.")
+        sys.exit(4)
+    r.raise_for_status()
+    return r.json()
+
+def gist_file_content(s: Session, gist: Dict[str, Any], filename: str) -> Optional[str]:
+    """
+    Current content of one file of a fetched gist, or None if the file doesn't exist yet.
+
+    Files larger than the API's inline limit are marked "truncated" and are read
+    from their raw_url instead.
+    """
+    f = (gist.get("files") or {}).get(filename)
+    if not f:
+        return None
+    if f.get("truncated") and f.get("raw_url"):
+        raw = _req_with_retry(s, "GET", f["raw_url"])
+        raw.raise_for_status()
+        return raw.text
+    return f.get("content")
+
+def update_gist_files(s: Session, gist_id: str, files: Dict[str, str], username: str, force: bool = False,
+                      stale: Optional[re.Pattern] = None) -> Tuple[str, List[str]]:
+    """
+    Write several files to a target gist, uploading only the ones that changed.
+
+    The gist is fetched once and each file is compared with its current version
+    using content_fingerprint(), so the PATCH carries only the files whose
+    content materially changed and upload size follows the size of the change.
+    Existing files matching `stale` that are not in `files` (for example shards
+    left over from a previous sharding layout) are deleted in the same PATCH.
+    With `force`, every file is uploaded without fetching the gist first, and
+    nothing is deleted.
+
+    Args:
+        s: Authenticated requests session
+        gist_id: ID of the gist to update
+        files: Mapping of filename to content
+        username: GitHub username for the gist description
+        force: If True, always PATCH every file without comparing
+        stale: Optional pattern of managed filenames to delete when no longer produced
+
+    Returns:
+        (URL of the gist, names of the files written or deleted; empty if nothing changed)
+
+    Raises:
+        SystemExit: If gist not found or token lacks access
+    """
+    description = f"Public gists from {username}"
+    changes: Dict[str, Optional[Dict[str, str]]] = {name: {"content": content} for name, content in files.items()}
+    current: Dict[str, Any] = {}
+    if not force:
+        current = fetch_gist(s, gist_id)
+        for name, content in files.items():
+            current_md = gist_file_content(s, current, name)
+            if current_md is not None and content_fingerprint(current_md) == content_fingerprint(content):
+                del changes[name]
+        if stale is not None:
+            for name in current.get("files") or {}:
+                if name not in files and stale.fullmatch(name):
+                    changes[name] = None
+        if not changes and current.get("description") == description:
+            logger.info(f"No material changes in {', '.join(files)}; skipping gist update")
+            return current.get("html_url", "(unknown)"), []
+
+    deleted = sum(1 for change in changes.values() if change is None)
+    logger.info(f"Uploading {len(changes) - deleted} of {len(files)} file(s) to the target gist"
+                + (f", deleting {deleted} stale file(s)" if deleted else ""))
+    payload = {"description": description, "files": changes}
+    r = _req_with_retry(s, "PATCH", f"{API}/gists/{gist_id}", json=payload)
+    if r.status_code == 404:
+        logger.error("LIST_GIST_ID not found or token lacks access to that gist.")
+        sys.exit(4)
+    r.raise_for_status()
+    # A description-only change still counts as a write
+    return r.json().get("html_url", "(unknown)"), list(changes) or ["description"]
+
+def update_index_gist(s: Session, gist_id: str, target_md: str, content_md: str, username: str, force: bool = False,
+                      extra_files: Optional[Dict[str, str]] = None) -> Tuple[str, bool]:
+    """
+    Update a target gist with the generated markdown content.
+    
+    This function updates an existing gist with the markdown table of public gists.
+    The gist is identified by its ID and the content is placed in a specific file.
+
+    Before writing, the current file is fetched and compared with the new content
+    using content_fingerprint(), which ignores the "Last updated" line. If nothing
+    material changed, the PATCH is skipped so the gist history isn't flooded with
+    timestamp-only revisions.
+
+    `extra_files` (shards from build_markdown_shards(), other output formats)
+    are written alongside `content_md`; only changed files are sent, and shard
+    or format files no longer produced are removed. See update_gist_files().
+    
+    Args:
+        s: Authenticated requests session
+        gist_id: ID of the gist to update
+        target_md: Filename for the markdown content in the gist
+        content_md: The markdown content to write
+        username: GitHub username for the gist description
+        force: If True, always PATCH without comparing
+        extra_files: Optional mapping of further filenames to content
+        
+    Returns:
+        (URL of the gist, True if a write happened)
+        
+    Raises:
+        SystemExit: If gist not found or token lacks access
+    """
+    files = {target_md: content_md, **(extra_files or {})}
+    url, written = update_gist_files(s, gist_id, files, username, force, stale=managed_file_pattern(target_md))
+    return url, bool(written)
+
+def report_publish_result(written: bool) -> None:
+    """Expose whether the gist was written as a GitHub Actions step output, if running in Actions."""
+    output = os.getenv("GITHUB_OUTPUT")
+    if not output:
+        return
+    try:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(f"published={'true' if written else 'false'}\n")
+    except OSError as e:
+        logger.debug(f"Could not write GITHUB_OUTPUT: {e}")
+
+@dataclass
+class RunResult:
+    username: str
+    exit_code: int = 0
+    gists: int = 0
+    refreshed: int = 0
+    written: Optional[bool] = None
+    url: Optional[str] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+    stale: int = 0
+
+def run_pipeline(cfg: Cfg, s: Session, scheduler: RateLimitScheduler, echo: bool = True) -> RunResult:
+    """
+    Fetch, enrich, render and publish the gist list for one configuration.
+
+    Args:
+        cfg: Configuration for this run
+        s: Session created by make_session() with `scheduler`
+        scheduler: Rate-limit scheduler shared by every request on `s`
+        echo: If True and no OUTPUT_FILE is configured, stream the markdown to stdout
+
+    Returns:
+        RunResult with the exit code and a summary of the run
+    """
+    started = time.time()
+    result = RunResult(username=cfg.username)
+    if cfg.fetch_mode == "graphql" and not cfg.token:
+        logger.warning("FETCH_MODE=graphql requires GIST_TOKEN; falling back to REST")
+        cfg.fetch_mode = "rest"
+    # A replayed run must not mark old counts as fresh in the state store
+    store = GistStateStore(cfg.state_db) if cfg.state_db and not cfg.replay_snapshot else None
+    try:
+        # Incremental listing: only ask for gists updated since the last run
+        since = None
+        if store and cfg.incremental_listing and cfg.fetch_mode == "rest":
+            since = store.listing_since(cfg.state_ttl_hours)
+        # Filters and LIMIT are applied while listing, so only displayed gists are ever enriched
+        keep = GistFilter.from_cfg(cfg)
+        selective = keep is not None or cfg.limit > 0
+        listing_started = time.time()
+        with _phase(s, "fetch"):
+            if cfg.fetch_mode == "graphql":
+                gists = list_public_gists_graphql(s, cfg.username, keep, cfg.limit)
+            else:
+                gists = list_public_gists(s, cfg.username, since=since, max_in_flight=cfg.max_in_flight,
+                                          keep=keep, limit=cfg.limit)
+        if since and store:
+            logger.info(f"Incremental listing: {len(gists)} gist(s) updated since {since}")
+            gists = select_gists(store.merge_listing(gists), keep, cfg.limit)
+        logger.debug(f"Found {len(gists)} public gists" + (" matching the filters" if selective else ""))
+        result.gists = len(gists)
+
+        # Incremental mode: reuse stored counts for unchanged gists, enrich the rest
+        pending: set = set()
+        if store:
+            restored = store.restore_fresh(gists, cfg.state_ttl_hours)
+            pending = {g.id for g in gists if g.id and not g.engagement}
+            logger.info(f"Incremental mode: {restored} gist(s) from state, {len(pending)} to refresh")
+
+        publish = bool(cfg.list_gist_id and cfg.token) and not cfg.replay_snapshot
+
+        # Check the remaining rate budgets against the estimated cost of the run
+        graphql_counts = uses_graphql_counts(s)
+        publish_files = publish_file_count(cfg, gists) if publish else 0
+        if cfg.rate_limit_policy != "ignore" and not cfg.replay_snapshot:
+            fetch_rate_budget(s, scheduler)
+        if cfg.rate_limit_policy == "refuse":
+            cost = estimate_run_cost(gists, publish_files, graphql_counts)
+            remaining = scheduler.remaining("core")
+            remaining_points = scheduler.remaining("graphql")
+            if remaining is not None and cost["core"] > remaining - cfg.rate_limit_reserve:
+                logger.error(f"Run needs ~{cost['core']} REST requests but only {remaining} remain "
+                             f"(reserve {cfg.rate_limit_reserve}); refusing to start")
+                result.exit_code = 7
+                result.error = "rate budget exhausted"
+                return result
+            if remaining_points is not None and cost["graphql"] > remaining_points:
+                logger.error(f"Run needs ~{cost['graphql']} GraphQL points but only {remaining_points} remain; "
+                             f"refusing to start")
+                result.exit_code = 7
+                result.error = "rate budget exhausted"
+                return result
+        elif cfg.rate_limit_policy == "degrade":
+            degraded = fit_to_rate_budget(gists, scheduler, publish_files, cfg.rate_limit_reserve,
+                                          store.load_all() if store else None, graphql_counts)
+            pending -= set(degraded or [])
+        result.refreshed = sum(1 for g in gists if not g.engagement)
+
+        formats = output_formats(cfg)
+        primary = formats[0]
+        primary_name = format_filename(cfg.target_md, primary, primary=True)
+        files: Dict[str, str] = {}
+        # With RUN_DEADLINE, gists left unrefreshed fall back to their stored counts
+        stale = StaleReport(store.load_all if store else None) if getattr(s, "deadline", None) else None
+        if cfg.shard_by != "none" and primary in ("markdown", "html"):
+            # Shards are bounded in size, so they are built in memory and written out whole
+            with _phase(s, "render"):
+                shards = build_markdown_shards(gists, cfg.username, s, cfg.target_md, cfg.shard_by, cfg.shard_size,
+                                               cfg.timezone, cfg.date_format, cfg.time_format, primary == "html",
+                                               cfg.max_in_flight, stale)
+                write_output_files(shards, cfg.target_md, cfg.output_file, echo)
+            files.update(shards)
+            # Every gist is enriched by now, so the remaining formats cost no requests
+            formats = formats[1:]
+        elif cfg.shard_by != "none":
+            logger.warning(f"SHARD_BY needs a table format first in OUTPUT_FORMATS; writing {primary} as one file")
+
+        # Formats other than the primary one only go to files: next to OUTPUT_FILE and/or into the gist
+        if not publish and not cfg.output_file:
+            dropped = [name for name in formats if name != primary]
+            if dropped:
+                logger.warning(f"OUTPUT_FORMATS {', '.join(dropped)} not written: needs OUTPUT_FILE or LIST_GIST_ID")
+                formats = [name for name in formats if name not in dropped]
+
+        if formats:
+            filenames = {name: format_filename(cfg.target_md, name, primary=name == primary) for name in formats}
+            formatters = {name: make_formatter(name, cfg.timezone, cfg.date_format, cfg.time_format) for name in formats}
+
+            # Stream rows to stdout (or OUTPUT_FILE) as they are rendered, one sink list per
+            # format. When publishing, each upload body is spooled alongside (to disk once it
+            # gets large) so a document is only materialized once, right before the PATCH.
+            with ExitStack() as stack:
+                sinks: Dict[str, List[TextIO]] = {}
+                bodies: Dict[str, Any] = {}
+                for name, filename in filenames.items():
+                    sinks[name] = []
+                    if filename == primary_name and not cfg.output_file:
+                        if echo:
+                            sinks[name].append(sys.stdout)
+                    elif cfg.output_file:
+                        path = cfg.output_file if filename == primary_name else os.path.join(os.path.dirname(cfg.output_file), filename)
+                        sinks[name].append(stack.enter_context(open(path, "w", encoding="utf-8")))
+                    if publish:
+                        bodies[name] = stack.enter_context(
+                            tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", encoding="utf-8"))
+                        sinks[name].append(bodies[name])
+                with _phase(s, "render"):
+                    write_routed(iter_documents(gists, cfg.username, s, formatters, cfg.max_in_flight, stale), sinks)
+                for name, body in bodies.items():
+                    body.seek(0)
+                    files[filenames[name]] = body.read()
+
+        # A partial list is still published, with a report of the rows whose counts are old
+        stale_name = shard_filename(cfg.target_md, "stale")
+        stale_path = os.path.join(os.path.dirname(cfg.output_file), stale_name) if cfg.output_file else None
+        if stale and stale.rows:
+            result.stale = len(stale.rows)
+            pending -= stale.ids()
+            logger.warning(f"Run deadline reached: {len(stale.rows)} gist(s) show last-known or N/A counts"
+                           + (f" (see {stale_name})" if publish or stale_path else ""))
+            report = "\n".join(stale.lines(cfg.username)) + "\n"
+            files[stale_name] = report
+            if stale_path:
+                with open(stale_path, "w", encoding="utf-8") as f:
+                    f.write(report)
+        elif stale_path and os.path.exists(stale_path):
+            os.remove(stale_path)
+
+        if store:
+            # An incremental or filtered listing can't tell which gists were deleted, so don't
+            # prune; a filtered one isn't recorded either, as it skipped gists the next one may need
+            store.save(gists, fetched_ids=pending, prune=since is None and not selective)
+            if not selective:
+                store.record_listing(listing_started, full=since is None)
+
+        if not publish:
+            return result
+    finally:
+        if store:
+            store.close()
+        result.seconds = time.time() - started
+
+    # Update gist (both LIST_GIST_ID and GIST_TOKEN are present)
+    try:
+        with _phase(s, "publish"):
+            md = files.pop(primary_name)
+            url, written = update_index_gist(s, cfg.list_gist_id, primary_name, md, cfg.username, cfg.force_publish, files)
+    except (requests.HTTPError, RateLimitDeadline) as e:
+        status = getattr(e, "response", None).status_code if getattr(e, "response", None) else "HTTP"
+        logger.warning(f"Gist update failed ({status}): {e}")
+        result.exit_code = 5
+        result.error = f"gist update failed ({status})"
+        return result
+    finally:
+        result.seconds = time.time() - started
+    result.written, result.url = written, url
+    if written:
+        logger.info(f"Updated gist: {url}")
+    else:
+        logger.info(f"Gist unchanged: {url}")
+        result.exit_code = cfg.unchanged_exit_code
+    return result
+
+def run_batch(path: str, base: Cfg) -> int:
+    """
+    Run every job from a batch config in one process.
+
+    All jobs share one pooled session and one RateLimitScheduler, so TLS
+    connections stay warm across jobs and every job draws from the same global
+    rate budget. A job with its own token runs on a job_session() over the same
+    transport. Jobs run concurrently and a per-job summary is printed to stdout.
+
+    Returns:
+        0 if every job succeeded, otherwise the highest job exit code
+    """
+    try:
+        jobs, concurrency = load_batch_jobs(path, base)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read BATCH_CONFIG {path}: {e}")
+        return 1
+    if not jobs:
+        logger.warning(f"No jobs in {path}")
+        return 0
+    logger.info(f"Running {len(jobs)} batch job(s), {concurrency} at a time")
+
+    scheduler = RateLimitScheduler()
+    metrics = RunMetrics() if base.metrics_file else None
+    # One deadline for the whole batch: it bounds the process, not each job
+    s = make_session(base.token, pool_size=base.max_in_flight * concurrency,
+                     cache_dir=base.http_cache_dir if base.http_cache else None,
+                     cache_max_mb=base.http_cache_max_mb, scheduler=scheduler, metrics=metrics,
+                     deadline=RunDeadline(base.run_deadline) if base.run_deadline else None,
+                     record_snapshot=base.record_snapshot, replay_snapshot=base.replay_snapshot)
+
+    def run_job(cfg: Cfg) -> RunResult:
+        try:
+            session = s if cfg.token == base.token else job_session(s, cfg.token)
+            return run_pipeline(cfg, session, scheduler, echo=False)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+            return RunResult(username=cfg.username, exit_code=code, error=f"exited with status {code}")
+        except Exception as e:
+            logger.error(f"Job for {cfg.username} failed: {e!r}")
+            return RunResult(username=cfg.username, exit_code=6, error=repr(e))
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(jobs))) as pool:
+        results = list(pool.map(run_job, jobs))
+    s.close()
+    if metrics:
+        metrics.write(base.metrics_file)
+
+    print(f"{'Username':<24} {'Status':<10} {'Gists':>6} {'Fetched':>8} {'Stale':>6} {'Seconds':>8}  Gist")
+    for r in results:
+        if r.error:
+            status = "failed"
+        elif r.written is None:
+            status = "rendered"
+        else:
+            status = "updated" if r.written else "unchanged"
+        print(f"{r.username:<24} {status:<10} {r.gists:>6} {r.refreshed:>8} {r.stale:>6} {r.seconds:>8.1f}  {r.url or r.error or ''}")
+    return max(r.exit_code for r in results)
+
+def poll_listing(s: Session, username: str, etag: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Check with a conditional request whether the first listing page changed.
+
+    The page holds the 100 most recently updated gists, so any new, edited or
+    recently deleted gist changes its ETag. An unchanged page is answered with
+    304 Not Modified (or served by the session's ETag cache).
+
+    Returns:
+        (True if the page changed, ETag to send on the next poll)
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    r = _req_with_retry(s, "GET", f"{API}/users/{username}/gists",
+                        params={"per_page": 100, "page": 1}, headers=headers)
+    if r.status_code == 304 or getattr(r, "from_cache", False):
+        return False, etag
+    if r.status_code == 404:
+        logger.error(f"User '{username}' not found or gists unavailable.")
+        sys.exit(2)
+    r.raise_for_status()
+    return True, r.headers.get("ETag") or etag
+
+def run_watch(cfg: Cfg, s: Session, scheduler: RateLimitScheduler, metrics: Optional[RunMetrics] = None) -> int:
+    """
+    Keep the gist list up to date from one long-running process.
+
+    The session (and its warm keep-alive connections) is reused for every cycle.
+    Each cycle polls the listing with poll_listing() and only runs the pipeline
+    when the listing changed, or when WATCH_MAX_INTERVAL has passed since the
+    last run so engagement counts (which don't touch the listing) get refreshed.
+    The poll interval starts at WATCH_MIN_INTERVAL, doubles after every quiet
+    cycle up to WATCH_MAX_INTERVAL, and drops back to the minimum after a change.
+
+    SIGTERM and SIGINT let the current cycle finish, then stop the loop.
+
+    Returns:
+        0 once stopped by a signal
+    """
+    stop = threading.Event()
+
+    def request_stop(signum: int, frame: Any) -> None:
+        logger.info(f"Received {signal.Signals(signum).name}; stopping after the current cycle")
+        stop.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, request_stop)
+
+    logger.info(f"Watching gists of {cfg.username} "
+                f"(poll every {cfg.watch_min_interval}-{cfg.watch_max_interval}s)")
+    etag: Optional[str] = None
+    last_run = 0.0
+    interval = cfg.watch_min_interval
+    while not stop.is_set():
+        try:
+            changed, etag = poll_listing(s, cfg.username, etag)
+            if changed or time.time() - last_run >= cfg.watch_max_interval:
+                logger.info("Gist listing changed; refreshing" if changed else "Periodic refresh of engagement counts")
+                # RUN_DEADLINE bounds each refresh, not the watch process
+                s.deadline = scheduler.deadline = RunDeadline(cfg.run_deadline) if cfg.run_deadline else None
+                result = run_pipeline(cfg, s, scheduler, echo=False)
+                s.deadline = scheduler.deadline = None
+                last_run = time.time()
+                if result.exit_code not in (0, cfg.unchanged_exit_code):
+                    logger.warning(f"Refresh failed with status {result.exit_code}: {result.error}")
+                if metrics:
+                    metrics.write(cfg.metrics_file)
+            if changed:
+                interval = cfg.watch_min_interval
+            else:
+                interval = min(interval * 2, cfg.watch_max_interval)
+        except requests.RequestException as e:
+            logger.warning(f"Watch cycle failed: {e!r}; retrying later")
+            interval = min(interval * 2, cfg.watch_max_interval)
+        logger.debug(f"Next poll in {interval}s")
+        stop.wait(interval)
+    logger.info("Watch mode stopped")
+    return 0
+
+def main() -> int:
+    """
+    Main function that orchestrates the gist list generation process.
+    
+    Called by cli.main() once the command line has been handled. This function:
+    1. Loads configuration from environment variables
+    2. Creates an authenticated session
+    3. Fetches all public gists for the specified user
+    4. Generates a markdown table with engagement metrics
+    5. Optionally updates a target gist with the generated content
+
+    If BATCH_CONFIG is set, the jobs from that file are run instead (see run_batch()).
+    If WATCH is set, the process keeps running and republishes on changes (see run_watch()).
+    RECORD_SNAPSHOT / REPLAY_SNAPSHOT record the run's API responses or replay
+    them without network access (see SnapshotRecorder and SnapshotReplayer).
+    
+    API Usage:
+    - 1 REST API call to list all public gists (includes created_at, updated_at, files info)
+    - 1 GraphQL API call per 100 gists for stars, comments and forks (aliased node() lookups, 4 in flight)
+    - 1 REST API call to read the target gist, plus 1 to update it only if the content changed (if configured)
+    
+    Total API calls: 1 + ceil(number_of_gists / 100) + 1 (if updating gist)
+
+    Without a token, comments and forks take 2 REST API calls per gist instead
+    (issued concurrently, MAX_IN_FLIGHT at a time) and stars are not available.
+
+    With FETCH_MODE=graphql, listing and engagement counts come from a single
+    paginated GraphQL stream instead: ceil(number_of_gists / 100) + 1 (if updating gist)
+    
+    The GitHub REST API already provides created_at, updated_at, and files information
+    in the initial gist listing, so no additional API calls are needed for these fields.
+    
+    Returns:
+        0 on success, 5 on gist update error, 7 if RATE_LIMIT_POLICY=refuse and the
+        remaining rate budget can't cover the run, UNCHANGED_EXIT_CODE (default 0)
+        if the target gist already had the same content and no write happened
+    """
+    batch_config = os.getenv("BATCH_CONFIG")
+    if batch_config:
+        return run_batch(batch_config, load_cfg(require_username=False))
+    
+    cfg = load_cfg()
+    logger.debug(f"Configuration loaded: username={cfg.username}, has_token={bool(cfg.token)}, has_gist_id={bool(cfg.list_gist_id)}")
+    
+    scheduler = RateLimitScheduler()
+    metrics = RunMetrics() if cfg.metrics_file else None
+    s = make_session(cfg.token, pool_size=cfg.max_in_flight,
+                     cache_dir=cfg.http_cache_dir if cfg.http_cache else None,
+                     cache_max_mb=cfg.http_cache_max_mb, scheduler=scheduler, metrics=metrics,
+                     deadline=RunDeadline(cfg.run_deadline) if cfg.run_deadline and not cfg.watch else None,
+                     record_snapshot=cfg.record_snapshot, replay_snapshot=cfg.replay_snapshot)
+    try:
+        if cfg.watch:
+            return run_watch(cfg, s, scheduler, metrics)
+        result = run_pipeline(cfg, s, scheduler)
+    finally:
+        # Closing the session also completes a RECORD_SNAPSHOT archive
+        s.close()
+        if metrics and not cfg.watch:
+            metrics.write(cfg.metrics_file)
+    if result.written is not None:
+        report_publish_result(result.written)
+    return result.exit_code
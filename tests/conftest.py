@@ -0,0 +1,114 @@
+# file: tests/conftest.py
+
+"""
+Shared fixtures.
+
+`transport` replaces the network below requests' HTTPAdapter: every request a
+session sends (through RateLimitedAdapter, ConditionalCacheAdapter or
+SnapshotRecorder) is answered by the test's handler with a real urllib3
+response, so streaming, Content-Length and connection release behave as they
+do against GitHub. `github` installs a FakeGitHub, serving one user's gists,
+as the handler.
+"""
+
+import io
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+API = "https://api.github.com"
+
+Reply = Tuple[int, Dict[str, str], Any]
+
+class FakeTransport:
+    """Answers requests with `handler(request) -> (status, headers, body)` and records them."""
+
+    def __init__(self) -> None:
+        self.handler: Optional[Callable[[requests.PreparedRequest], Reply]] = None
+        self.requests: List[requests.PreparedRequest] = []
+
+    def send(self, adapter: HTTPAdapter, request: requests.PreparedRequest, **kw: Any) -> requests.Response:
+        if self.handler is None:
+            raise AssertionError(f"unexpected network request: {request.method} {request.url}")
+        self.requests.append(request)
+        status, headers, body = self.handler(request)
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8") if body is not None else b""
+        headers = {"Content-Length": str(len(body)), **headers}
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status, reason="",
+                           preload_content=False, decode_content=True, request_method=request.method)
+        return adapter.build_response(request, raw)
+
+@pytest.fixture
+def transport(monkeypatch: pytest.MonkeyPatch) -> FakeTransport:
+    fake = FakeTransport()
+    monkeypatch.setattr(HTTPAdapter, "send", lambda adapter, request, **kw: fake.send(adapter, request, **kw))
+    return fake
+
+class FakeGitHub:
+    """
+    Handler for `transport`: one user's gist listing (paginated, newest first),
+    aliased GraphQL node() count lookups and GET /rate_limit.
+
+    Gist i has i % 5 comments, i % 3 forks and 10 + i stars. Node IDs it doesn't
+    know come back null with a NOT_FOUND error, as GitHub does. `budgets` is the
+    /rate_limit `resources` body; None answers 404, so the scheduler stays
+    unprimed. `node_queries` collects the variables of every node() lookup.
+    """
+
+    def __init__(self, gists: int, username: str = "octocat",
+                 budgets: Optional[Dict[str, Dict[str, int]]] = None) -> None:
+        self.username = username
+        self.budgets = budgets
+        self.node_queries: List[Dict[str, str]] = []
+        self.gists = [
+            {"id": f"g{i}", "node_id": f"G_g{i}", "description": f"Gist {i}\nwith details", "public": True,
+             "created_at": "2024-01-01T00:00:00Z", "updated_at": f"2024-01-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+             "html_url": f"https://gist.github.com/{username}/g{i}", "files": {f"f{i}.py": {"language": "Python", "size": 10}}}
+            for i in range(gists)
+        ][::-1]
+
+    def __call__(self, request: requests.PreparedRequest) -> Reply:
+        url = request.url or ""
+        if url == f"{API}/rate_limit":
+            if self.budgets is None:
+                return 404, {}, {"message": "Not Found"}
+            return 200, {}, {"resources": self.budgets}
+        match = re.fullmatch(rf"{API}/users/{self.username}/gists\?(.*)", url)
+        if request.method == "GET" and match:
+            query = dict(p.split("=", 1) for p in match.group(1).split("&"))
+            per_page, page = int(query.get("per_page", 30)), int(query.get("page", 1))
+            last = max(1, -(-len(self.gists) // per_page))
+            headers = {"Content-Type": "application/json"}
+            if last > 1:
+                headers["Link"] = f'<{API}/users/{self.username}/gists?per_page={per_page}&page={last}>; rel="last"'
+            return 200, headers, self.gists[(page - 1) * per_page:page * per_page]
+        if request.method == "POST" and url == f"{API}/graphql":
+            variables = json.loads(request.body)["variables"]
+            self.node_queries.append(variables)
+            known = {g["node_id"]: int(g["id"][1:]) for g in self.gists}
+            data, errors = {}, []
+            for var, node_id in variables.items():
+                alias, i = f"g{var[1:]}", known.get(node_id)
+                if i is None:
+                    data[alias] = None
+                    errors.append({"type": "NOT_FOUND", "path": [alias], "message": f"Could not resolve {node_id}"})
+                    continue
+                data[alias] = {"stargazerCount": 10 + i, "comments": {"totalCount": i % 5},
+                               "forks": {"totalCount": i % 3}}
+            return 200, {"Content-Type": "application/json"}, {"data": data, **({"errors": errors} if errors else {})}
+        raise AssertionError(f"unexpected request {request.method} {url}")
+
+@pytest.fixture
+def github(transport: FakeTransport) -> Callable[..., FakeGitHub]:
+    """Install a FakeGitHub as the transport's handler: `github(gists, budgets=...)`."""
+    def install(gists: int, **kw: Any) -> FakeGitHub:
+        fake = FakeGitHub(gists, **kw)
+        transport.handler = fake
+        return fake
+    return install
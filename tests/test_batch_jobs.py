@@ -0,0 +1,47 @@
+# file: tests/test_batch_jobs.py
+
+"""Tests for reading BATCH_CONFIG jobs (config.load_batch_jobs)."""
+
+import json
+
+import pytest
+
+from make_gist_list.config import Cfg, load_batch_jobs
+
+BASE = Cfg(username="", list_gist_id=None, token=None, target_md="Public-gists.md", timezone="UTC",
+           date_format="YYYY-MM-DD", time_format="24", use_html_table=False)
+
+def load(tmp_path, jobs):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({"jobs": jobs}), encoding="utf-8")
+    return load_batch_jobs(str(path), BASE)[0]
+
+def test_values_are_coerced_to_the_field_types(tmp_path):
+    [cfg] = load(tmp_path, [{"username": "alice", "max_in_flight": "4", "list_gist_id": 12345, "force_publish": "yes",
+                             "token": "", "output_formats": "Markdown, csv", "filter_since": "2024-01-02T03:04:05+02:00",
+                             "fetch_mode": "GraphQL", "limit": 0}])
+    assert (cfg.max_in_flight, cfg.list_gist_id, cfg.force_publish, cfg.token) == (4, "12345", True, None)
+    assert cfg.output_formats == ["markdown", "csv"]
+    assert cfg.filter_since == "2024-01-02T01:04:05Z"
+    assert (cfg.fetch_mode, cfg.limit) == ("graphql", 0)
+
+@pytest.mark.parametrize("field, value", [
+    ("shard_size", None),
+    ("max_in_flight", "four"),
+    ("max_in_flight", 0),
+    ("max_in_flight", True),
+    ("max_in_flight", 2.5),
+    ("use_html_table", "maybe"),
+    ("fetch_mode", "soap"),
+    ("output_formats", ["markdown", "pdf"]),
+    ("output_formats", [1]),
+    ("filter_until", "last week"),
+    ("target_md", ["a.md"]),
+])
+def test_bad_values_name_the_job(tmp_path, field, value):
+    with pytest.raises(ValueError, match=rf"batch job #2 \(bob\): {field}"):
+        load(tmp_path, [{"username": "alice"}, {"username": "bob", field: value}])
+
+def test_job_must_be_an_object(tmp_path):
+    with pytest.raises(ValueError, match="batch job #1 must be an object"):
+        load(tmp_path, ["alice"])
@@ -0,0 +1,87 @@
+# file: tests/test_http_cache.py
+
+"""Tests for the on-disk HTTP validator cache (core.ConditionalCacheAdapter)."""
+
+import os
+
+import requests
+
+from make_gist_list.core import make_session
+
+URL = "https://api.github.com/users/octocat/gists?per_page=100&page=1"
+
+def etag_server(bodies):
+    """Handler serving bodies[url] with a per-body ETag and answering 304 to a matching If-None-Match."""
+    def handler(request):
+        body = bodies[request.url]
+        etag = f'"{len(body)}-{hash(body) & 0xffff}"'
+        if request.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Content-Type": "application/json"}, body
+    return handler
+
+def cache_keys(cache_dir):
+    return sorted(n[:-len(".body")] for n in os.listdir(cache_dir) if n.endswith(".body"))
+
+def test_etag_round_trip(transport, tmp_path):
+    body = b'[{"id": "abc", "description": "' + b"x" * 200_000 + b'"}]'
+    transport.handler = etag_server({URL: body})
+    s = make_session("t0k", cache_dir=str(tmp_path))
+
+    r = s.get(URL, stream=True)
+    assert r.status_code == 200 and not r.from_cache
+    assert b"".join(r.iter_content(4096)) == body
+    assert len(cache_keys(tmp_path)) == 1
+
+    r = s.get(URL)
+    assert transport.requests[-1].headers["If-None-Match"]
+    assert (r.status_code, r.from_cache, r.content) == (200, True, body)
+    assert r.headers["Content-Type"] == "application/json"
+
+    # A streamed request served from the cache still yields the whole body
+    r = s.get(URL, stream=True)
+    assert r.from_cache
+    assert b"".join(r.iter_content(4096)) == body
+
+def test_partly_read_body_is_not_stored(transport, tmp_path):
+    transport.handler = etag_server({URL: b"[1, 2, 3]" * 10_000})
+    s = make_session(None, cache_dir=str(tmp_path))
+    r = s.get(URL, stream=True)
+    next(r.iter_content(1024))
+    r.close()
+    assert cache_keys(tmp_path) == []
+
+def test_lru_eviction_at_max_mb(transport, tmp_path):
+    urls = [f"https://api.github.com/gists/{name}" for name in "abc"]
+    transport.handler = etag_server({url: name.encode() * 400_000 for url, name in zip(urls, "abc")})
+    s = make_session("t0k", cache_dir=str(tmp_path), cache_max_mb=1)
+    adapter = s.get_adapter(urls[0])
+    key = {url: adapter._key(s.prepare_request(requests.Request("GET", url))) for url in urls}
+
+    s.get(urls[0]).content
+    s.get(urls[1]).content
+    # Make "a" older than "b", then use it so "b" becomes least recently used
+    for url, age in ((urls[0], 200), (urls[1], 100)):
+        path = os.path.join(tmp_path, key[url] + ".body")
+        os.utime(path, (os.path.getatime(path) - age, os.path.getmtime(path) - age))
+    assert s.get(urls[0]).from_cache
+
+    s.get(urls[2]).content
+    assert cache_keys(tmp_path) == sorted([key[urls[0]], key[urls[2]]])
+    assert adapter._size <= 1024 * 1024
+
+def test_entries_are_kept_per_token(transport, tmp_path):
+    transport.handler = etag_server({URL: b"[]"})
+    alice = make_session("alice", cache_dir=str(tmp_path))
+    bob = make_session("bob", cache_dir=str(tmp_path))
+    anonymous = make_session(None, cache_dir=str(tmp_path))
+
+    alice.get(URL).content
+    r = bob.get(URL)
+    assert "If-None-Match" not in transport.requests[-1].headers and not r.from_cache
+    r = anonymous.get(URL)
+    assert "If-None-Match" not in transport.requests[-1].headers and not r.from_cache
+    assert len(cache_keys(tmp_path)) == 3
+
+    assert alice.get(URL).from_cache
+    assert bob.get(URL).from_cache
@@ -0,0 +1,45 @@
+# file: tests/test_iter_json_array.py
+
+"""Tests for the incremental listing decoder (core.iter_json_array)."""
+
+import json
+
+import pytest
+
+from make_gist_list.core import iter_json_array
+
+DOCUMENTS = [
+    "[]",
+    " [ ] ",
+    "[1.5, 2]",
+    "[-0.25, 1e3, 12E-2, 0, -7]",
+    '[true, false, null, "a\\\\\\"b", "\\u00e9\\u2603 snow"]',
+    '[{"id": "abc", "files": {"a.py": {"size": 120, "language": "Python"}}}, [1, [2, []]], {}]',
+    '[12345678901234567890, 3.14159]',
+    '["é☃ multi-byte", 42]',
+]
+
+def split_at(data: bytes, *offsets: int):
+    bounds = [0, *offsets, len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_every_split_offset(doc):
+    data = doc.encode("utf-8")
+    expected = json.loads(doc)
+    for offset in range(len(data) + 1):
+        assert list(iter_json_array(split_at(data, offset))) == expected, offset
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_fixed_chunk_sizes(doc, size):
+    data = doc.encode("utf-8")
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    assert list(iter_json_array(chunks)) == json.loads(doc)
+
+@pytest.mark.parametrize("doc", ["[1]x", "[1] [2]", "{}", "[1 2]", "[1,]", "[1,", "[", "", "[1.]", "[tru]"])
+def test_rejects_malformed_input(doc):
+    data = doc.encode("utf-8")
+    for offset in range(len(data) + 1):
+        with pytest.raises(ValueError):
+            list(iter_json_array(split_at(data, offset)))
@@ -0,0 +1,66 @@
+# file: tests/test_publish.py
+
+"""Tests for publishing to the target gist (core.update_index_gist)."""
+
+import json
+from dataclasses import replace
+
+import pytest
+
+from make_gist_list.config import load_cfg
+from make_gist_list.core import GistRecord, RowFormatter, make_session, update_index_gist
+
+GIST_URL = "https://api.github.com/gists/target"
+
+def render(gists, now):
+    fmt = RowFormatter()
+    fmt.now = lambda: now
+    lines = [*fmt.head("octocat", len(gists))]
+    for g in gists:
+        lines += fmt.rows(g)
+    lines += fmt.tail("octocat")
+    return "\n".join(lines) + "\n"
+
+GISTS = [GistRecord(id="abc", description="Example", public=True, created_at="2024-01-01T00:00:00Z",
+                    updated_at="2024-05-01T10:00:00Z", html_url="https://gist.github.com/octocat/abc",
+                    file_names=("a.py",), language="Python", engagement={"comments": 1, "forks": 0, "stars": 3})]
+
+@pytest.fixture
+def target_gist(transport):
+    """A target gist that already holds yesterday's list; PATCHes are applied to it."""
+    gist = {"html_url": "https://gist.github.com/octocat/target", "description": "Public gists from octocat",
+            "files": {"Public-gists.md": {"content": render(GISTS, "2024-05-01 08:00 UTC")}}}
+    patches = []
+
+    def handler(request):
+        assert request.url == GIST_URL
+        if request.method == "PATCH":
+            payload = json.loads(request.body)
+            patches.append(payload)
+            for name, change in payload["files"].items():
+                gist["files"][name] = change
+        return 200, {}, gist
+
+    transport.handler = handler
+    return patches
+
+def test_timestamp_only_change_is_not_published(target_gist):
+    s = make_session("t0k")
+    _, written = update_index_gist(s, "target", "Public-gists.md", render(GISTS, "2024-05-02 08:00 UTC"), "octocat")
+    assert not written
+    assert target_gist == []
+
+def test_force_publish_writes_a_timestamp_only_change(target_gist, monkeypatch):
+    monkeypatch.setenv("FORCE_PUBLISH", "true")
+    cfg = load_cfg(require_username=False)
+    s = make_session("t0k")
+    content = render(GISTS, "2024-05-02 08:00 UTC")
+    _, written = update_index_gist(s, "target", "Public-gists.md", content, "octocat", cfg.force_publish)
+    assert written
+    assert [p["files"] for p in target_gist] == [{"Public-gists.md": {"content": content}}]
+
+def test_material_change_is_published(target_gist):
+    s = make_session("t0k")
+    gists = [replace(GISTS[0], engagement={"comments": 2, "forks": 0, "stars": 3})]
+    _, written = update_index_gist(s, "target", "Public-gists.md", render(gists, "2024-05-02 08:00 UTC"), "octocat")
+    assert written and len(target_gist) == 1
@@ -0,0 +1,105 @@
+# file: tests/test_rate_budget.py
+
+"""Batched node() count lookups and the rate budget policies (core.get_gist_counts_batch, core.fit_to_rate_budget)."""
+
+import pytest
+
+from make_gist_list.config import DEFAULT_RATE_LIMIT_RESERVE, Cfg
+from make_gist_list.core import (GistRecord, RateLimitScheduler, affordable_node_lookups, estimate_run_cost,
+                                 fit_to_rate_budget, get_gist_counts_batch, gist_node_id, make_session,
+                                 run_pipeline)
+
+def budget(remaining, limit=5000):
+    return {"limit": limit, "used": limit - remaining, "remaining": remaining, "reset": 2_000_000_000}
+
+def gist(i, **engagement):
+    return GistRecord(id=f"g{i}", description=f"gist {i}", public=True, created_at="2024-01-01T00:00:00Z",
+                      updated_at=f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}Z",
+                      html_url=f"https://gist.github.com/octocat/g{i}", file_names=(f"f{i}.py",), language="Python",
+                      engagement=engagement or None, node_id=f"G_g{i}")
+
+def counts(i):
+    return {"comments": i % 5, "forks": i % 3, "stars": 10 + i}
+
+def cfg(output_file, token="t0k", policy="degrade"):
+    return Cfg(username="octocat", list_gist_id=None, token=token, target_md="Public-gists.md", timezone="UTC",
+               date_format="YYYY-MM-DD", time_format="24", use_html_table=False, http_cache=False,
+               output_file=str(output_file), rate_limit_policy=policy)
+
+def run(c):
+    scheduler = RateLimitScheduler()
+    s = make_session(c.token, scheduler=scheduler)
+    try:
+        return run_pipeline(c, s, scheduler, echo=False)
+    finally:
+        s.close()
+
+def test_lookups_go_out_in_chunks_of_100(github):
+    fake = github(250)
+    ids = [f"g{i}" for i in range(250)]
+    result = get_gist_counts_batch(make_session("t0k"), ids, node_ids={i: f"G_{i}" for i in ids})
+    assert sorted(len(q) for q in fake.node_queries) == [50, 100, 100]
+    # Every chunk binds its gists to $i0..$iN in order
+    assert all(list(q) == [f"i{n}" for n in range(len(q))] for q in fake.node_queries)
+    assert sorted(v for q in fake.node_queries for v in q.values()) == sorted(f"G_{i}" for i in ids)
+    assert result == {f"g{i}": counts(i) for i in range(250)}
+
+def test_aliases_map_back_to_gist_ids(github):
+    fake = github(5)
+    # g3 has no node ID from the listing, and the legacy one doesn't resolve; "gone" was deleted
+    ids = ["g4", "gone", "g0", "g3", "g2"]
+    node_ids = {"g4": "G_g4", "gone": "G_gone", "g0": "G_g0", "g2": "G_g2"}
+    result = get_gist_counts_batch(make_session("t0k"), ids, node_ids=node_ids)
+    assert fake.node_queries == [{"i0": "G_g4", "i1": "G_gone", "i2": "G_g0", "i3": gist_node_id("g3"), "i4": "G_g2"}]
+    assert result == {"g4": counts(4), "g0": counts(0), "g2": counts(2)}
+
+def test_graphql_cost_counts_whole_chunks_and_publishing():
+    # One pending gist in each chunk of 100 still costs a query per chunk
+    gists = [gist(i) if i % 100 == 0 else gist(i, comments=0, forks=0, stars=0) for i in range(300)]
+    assert estimate_run_cost(gists, graphql=True) == {"core": 0, "graphql": 3}
+    assert affordable_node_lookups(gists, 2) == 2
+    # Publishing two files: GET, two raw reads and the PATCH, whichever way counts are fetched
+    assert estimate_run_cost(gists, publish_files=2, graphql=True)["core"] == 4
+    assert estimate_run_cost(gists, publish_files=2)["core"] == 2 * 3 + 4
+
+def test_budgets_are_charged_separately():
+    gists = [gist(i) for i in range(250)]
+    scheduler = RateLimitScheduler()
+    scheduler.seed({"core": budget(0), "graphql": budget(8)})
+    # Three lookups (3 + 3 + 2 points) fit; the empty REST budget only holds up publishing
+    assert fit_to_rate_budget(gists, scheduler, 1, DEFAULT_RATE_LIMIT_RESERVE, graphql=True) is None
+
+    scheduler = RateLimitScheduler()
+    scheduler.seed({"core": budget(DEFAULT_RATE_LIMIT_RESERVE + 3 + 2 * 40), "graphql": budget(0)})
+    degraded = fit_to_rate_budget(gists, scheduler, 1, DEFAULT_RATE_LIMIT_RESERVE)
+    assert len(degraded) == 210 and "g249" not in degraded and "g209" in degraded
+    assert all(g.engagement == {"comments": "N/A", "forks": "N/A", "stars": "N/A"} for g in gists if g.id in degraded)
+
+def test_degrade_with_a_primed_scheduler(github, tmp_path):
+    fake = github(250, budgets={"core": budget(4000), "graphql": budget(4)})
+    result = run(cfg(tmp_path / "list.md"))
+    assert result.exit_code == 0
+    # 4 points: a full query (3 points) and 33 gists on the last one
+    assert sorted(len(q) for q in fake.node_queries) == [33, 100]
+    assert result.refreshed == 133
+    text = (tmp_path / "list.md").read_text(encoding="utf-8")
+    assert "g249" in text and text.count("| N/A | N/A | N/A |") == 117
+
+def test_refuse_with_a_primed_scheduler(github, tmp_path):
+    fake = github(250, budgets={"core": budget(4000), "graphql": budget(7)})
+    result = run(cfg(tmp_path / "list.md", policy="refuse"))
+    assert (result.exit_code, result.error) == (7, "rate budget exhausted")
+    assert fake.node_queries == [] and not (tmp_path / "list.md").exists()
+
+    # Without a token every gist costs two REST calls
+    github(250, budgets={"core": budget(DEFAULT_RATE_LIMIT_RESERVE + 499), "graphql": budget(5000)})
+    assert run(cfg(tmp_path / "list.md", token=None, policy="refuse")).exit_code == 7
+
+@pytest.mark.parametrize("policy", ["degrade", "refuse"])
+def test_unprimed_scheduler_is_not_charged(github, tmp_path, policy):
+    # GET /rate_limit fails, so the GraphQL budget stays unknown
+    fake = github(250)
+    result = run(cfg(tmp_path / "list.md", policy=policy))
+    assert result.exit_code == 0 and result.refreshed == 250
+    assert sorted(len(q) for q in fake.node_queries) == [50, 100, 100]
+    assert "N/A" not in (tmp_path / "list.md").read_text(encoding="utf-8")
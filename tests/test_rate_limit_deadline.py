@@ -0,0 +1,60 @@
+# file: tests/test_rate_limit_deadline.py
+
+"""Rate-limit waits never outlast RUN_DEADLINE (core.RateLimitScheduler, core.iter_enriched)."""
+
+import time
+
+import pytest
+
+from make_gist_list.core import (GistRecord, RateLimitDeadline, RateLimitScheduler, RunDeadline, StaleReport,
+                                 iter_enriched, make_session)
+
+def gist(gist_id):
+    return GistRecord(id=gist_id, description=gist_id, public=True, created_at="2024-01-01T00:00:00Z",
+                      updated_at="2024-05-01T10:00:00Z", html_url=f"https://gist.github.com/octocat/{gist_id}",
+                      file_names=("a.py",), language="Python")
+
+def exhausted(reset_in=60):
+    return {"limit": 5000, "remaining": 0, "reset": int(time.time() + reset_in)}
+
+def test_reset_after_the_deadline_raises_at_once():
+    scheduler = RateLimitScheduler()
+    scheduler.budgets["core"] = exhausted()
+    scheduler.deadline = RunDeadline(3)
+    started = time.monotonic()
+    with pytest.raises(RateLimitDeadline):
+        scheduler.acquire("GET", "https://api.github.com/gists/abc/comments")
+    assert time.monotonic() - started < 0.5
+    # The GraphQL budget is separate and still usable
+    scheduler.acquire("POST", "https://api.github.com/graphql")
+
+def test_pause_within_the_deadline_is_waited_out():
+    scheduler = RateLimitScheduler()
+    scheduler.deadline = RunDeadline(3)
+    scheduler._paused_until = time.time() + 0.3
+    started = time.monotonic()
+    scheduler.acquire("GET", "https://api.github.com/gists/abc")
+    assert 0.2 < time.monotonic() - started < 1.5
+
+@pytest.mark.parametrize("token", [None, "t0k"])
+def test_exhausted_limit_falls_back_to_last_known_counts(transport, token):
+    def handler(request):
+        resource = "graphql" if request.url.endswith("/graphql") else "core"
+        reset = str(int(time.time() + 60))
+        return 403, {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset,
+                     "X-RateLimit-Resource": resource}, {"message": "API rate limit exceeded"}
+
+    transport.handler = handler
+    s = make_session(token, deadline=RunDeadline(3))
+    known = gist("a")
+    known.engagement, known.counts_fetched_at = {"comments": 4, "forks": 1, "stars": 9}, time.time() - 3600
+    stale = StaleReport(lambda: {"a": known})
+
+    started = time.monotonic()
+    gists = list(iter_enriched([gist("a"), gist("b")], s, max_in_flight=2, stale=stale))
+    assert time.monotonic() - started < 1.0
+    assert gists[0].engagement == {"comments": 4, "forks": 1, "stars": 9}
+    assert gists[1].engagement == {"comments": "N/A", "forks": "N/A", "stars": "N/A"}
+    assert stale.ids() == {"a", "b"}
+    # One request per budget saw the 403; nothing waited for the reset
+    assert len(transport.requests) <= 2
@@ -0,0 +1,41 @@
+# file: tests/test_run_metrics.py
+
+"""Tests for per-endpoint byte accounting in core.RunMetrics."""
+
+import gzip
+
+from make_gist_list.core import LISTING_CHUNK_SIZE, RunMetrics, make_session
+
+LISTING = "https://api.github.com/users/octocat/gists?per_page=100&page=1"
+BODY = b"[" + b",".join(b'{"id": "%d"}' % i for i in range(5000)) + b"]"
+
+def test_streamed_and_cached_bodies(transport, tmp_path):
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        # Content-Length is the compressed size; the decoded body is what gets counted
+        return 200, {"ETag": '"v1"', "Content-Encoding": "gzip"}, gzip.compress(BODY)
+
+    transport.handler = handler
+    metrics = RunMetrics()
+    s = make_session("t0k", cache_dir=str(tmp_path), metrics=metrics)
+
+    r = s.get(LISTING, stream=True)
+    assert b"".join(r.iter_content(LISTING_CHUNK_SIZE)) == BODY
+    listing = metrics.report()["endpoints"]["list"]
+    assert (listing["requests"], listing["bytes"], listing["cache_hits"]) == (1, len(BODY), 0)
+
+    r = s.get(LISTING)
+    assert r.from_cache
+    listing = metrics.report()["endpoints"]["list"]
+    assert (listing["requests"], listing["bytes"], listing["cache_hits"], listing["cache_bytes"]) == (2, len(BODY), 1, len(BODY))
+    assert 'make_gist_list_cache_hit_bytes_total{endpoint="list"} %d' % len(BODY) in metrics.to_prometheus()
+
+def test_partly_read_body_counts_what_was_read(transport):
+    transport.handler = lambda request: (200, {}, BODY)
+    metrics = RunMetrics()
+    s = make_session(None, metrics=metrics)
+    r = s.get(LISTING, stream=True)
+    next(r.iter_content(1024))
+    r.close()
+    assert metrics.report()["endpoints"]["list"]["bytes"] == 1024
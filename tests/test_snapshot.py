@@ -0,0 +1,56 @@
+# file: tests/test_snapshot.py
+
+"""Record and replay a whole run (core.SnapshotRecorder, core.SnapshotReplayer)."""
+
+import pytest
+
+from make_gist_list.config import Cfg
+from make_gist_list.core import RateLimitScheduler, RowFormatter, SnapshotMiss, make_session, run_pipeline
+
+BUDGET = {"limit": 5000, "remaining": 4000, "reset": 2_000_000_000}
+
+def cfg(output_file, username="octocat", **kw):
+    return Cfg(username=username, list_gist_id=None, token="t0k", target_md="Public-gists.md", timezone="UTC",
+               date_format="YYYY-MM-DD", time_format="24", use_html_table=False, http_cache=False,
+               output_file=str(output_file), output_formats=["markdown", "csv"], **kw)
+
+def run(c, **session_kw):
+    scheduler = RateLimitScheduler()
+    s = make_session(c.token, scheduler=scheduler, **session_kw)
+    try:
+        return run_pipeline(c, s, scheduler, echo=False)
+    finally:
+        s.close()
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    monkeypatch.setattr(RowFormatter, "now", lambda self: "2024-07-01 09:00 UTC")
+
+def test_replay_reproduces_the_recorded_run(transport, github, tmp_path):
+    archive = tmp_path / "run.jsonl.gz"
+    recorded_dir, replayed_dir = tmp_path / "recorded", tmp_path / "replayed"
+    recorded_dir.mkdir()
+    replayed_dir.mkdir()
+    github(3, budgets={"core": BUDGET, "graphql": BUDGET})
+    recorded = run(cfg(recorded_dir / "list.md", record_snapshot=str(archive)), record_snapshot=str(archive))
+    assert recorded.exit_code == 0 and len(transport.requests) == 3
+
+    # No handler: any request that reaches the transport fails the test
+    transport.handler = None
+    transport.requests.clear()
+    replayed = run(cfg(replayed_dir / "list.md", replay_snapshot=str(archive)), replay_snapshot=str(archive))
+    assert replayed.exit_code == 0 and transport.requests == []
+
+    assert sorted(p.name for p in replayed_dir.iterdir()) == ["Public-gists.csv", "list.md"]
+    for name in ("list.md", "Public-gists.csv"):
+        assert (replayed_dir / name).read_bytes() == (recorded_dir / name).read_bytes()
+    assert "| 10 |" in (replayed_dir / "list.md").read_text(encoding="utf-8")
+
+def test_unrecorded_request_raises_snapshot_miss(transport, github, tmp_path):
+    archive = tmp_path / "run.jsonl.gz"
+    github(3, budgets={"core": BUDGET, "graphql": BUDGET})
+    run(cfg(tmp_path / "recorded.md"), record_snapshot=str(archive))
+
+    transport.handler = None
+    with pytest.raises(SnapshotMiss, match=r"GET https://api\.github\.com/users/someone-else/gists\S* is not in the snapshot"):
+        run(cfg(tmp_path / "replayed.md", username="someone-else"), replay_snapshot=str(archive))
@@ -0,0 +1,86 @@
+# file: tests/test_state_store.py
+
+"""Tests for the incremental-run state store (core.GistStateStore)."""
+
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from make_gist_list.core import LISTING_SKEW_SECONDS, GistRecord, GistStateStore, list_public_gists, make_session
+
+def gist(gist_id, updated_at="2024-05-01T10:00:00Z", **engagement):
+    return GistRecord(id=gist_id, description=f"gist {gist_id}", public=True, created_at="2024-01-01T00:00:00Z",
+                      updated_at=updated_at, html_url=f"https://gist.github.com/octocat/{gist_id}",
+                      file_names=(f"{gist_id}.py",), language="Python", engagement=engagement or None,
+                      node_id=f"G_{gist_id}")
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, ZoneInfo("UTC")).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def age_counts(store, gist_id, hours):
+    with store.conn:
+        store.conn.execute("UPDATE gists SET counts_fetched_at = ? WHERE id = ?", (time.time() - hours * 3600, gist_id))
+
+def test_fresh_and_stale_rows(tmp_path):
+    path = str(tmp_path / "state" / "gists.sqlite")
+    with GistStateStore(path) as store:
+        store.save([gist("fresh", comments=2, forks=1, stars=5), gist("old", comments=3, forks=0, stars=1),
+                    gist("edited", comments=1, forks=1, stars=1), gist("unknown", comments="N/A", forks=4, stars=0)])
+        age_counts(store, "old", 25)
+
+    # Reopened from disk, as the next run would
+    with GistStateStore(path) as store:
+        stored = store.load_all()
+        assert stored["fresh"].to_record() == gist("fresh").to_record()
+        assert stored["unknown"].engagement == {"comments": "N/A", "forks": 4, "stars": 0}
+
+        listed = [gist("fresh"), gist("old"), gist("edited", updated_at="2024-06-01T00:00:00Z"), gist("unknown"),
+                  gist("new")]
+        assert store.restore_fresh(listed, ttl_hours=24) == 1
+        by_id = {g.id: g for g in listed}
+        assert by_id["fresh"].engagement == {"comments": 2, "forks": 1, "stars": 5}
+        assert all(by_id[i].engagement is None for i in ("old", "edited", "unknown", "new"))
+
+        # A longer TTL makes the day-old row fresh again
+        listed = [gist("old")]
+        assert store.restore_fresh(listed, ttl_hours=48) == 1
+
+def test_save_keeps_counts_that_were_not_refetched(tmp_path):
+    with GistStateStore(str(tmp_path / "gists.sqlite")) as store:
+        store.save([gist("a", comments=2, forks=1, stars=5), gist("b", comments=1, forks=1, stars=1)])
+        age_counts(store, "a", 10)
+        store.save([gist("a", comments=0, forks=0, stars=0), gist("c", comments=7, forks=0, stars=0)],
+                   fetched_ids={"c"})
+        stored = store.load_all()
+        assert set(stored) == {"a", "c"}
+        assert stored["a"].engagement == {"comments": 2, "forks": 1, "stars": 5}
+        assert time.time() - stored["a"].counts_fetched_at > 9 * 3600
+
+def test_listing_cursor_round_trip(tmp_path, transport):
+    path = str(tmp_path / "gists.sqlite")
+    with GistStateStore(path) as store:
+        assert store.listing_since(ttl_hours=24) is None
+        started = time.time() - 60
+        store.record_listing(started, full=True)
+        store.save([gist("a", comments=1, forks=0, stars=0), gist("b", comments=0, forks=0, stars=0)])
+
+    with GistStateStore(path) as store:
+        since = store.listing_since(ttl_hours=24)
+        assert since == iso(started - LISTING_SKEW_SECONDS)
+
+        # The cursor is sent to GitHub, and only changed gists come back
+        changed = gist("b", updated_at="2024-07-01T00:00:00Z")
+        transport.handler = lambda request: (200, {}, [{**changed.to_record(), "files": {"b.py": {"language": "Python"}},
+                                                         "node_id": changed.node_id}])
+        listed = list_public_gists(make_session(None), "octocat", since=since)
+        assert f"since={since.replace(':', '%3A')}" in transport.requests[0].url
+        merged = {g.id: g for g in store.merge_listing(listed)}
+        assert set(merged) == {"a", "b"}
+        assert merged["b"].updated_at == "2024-07-01T00:00:00Z"
+        assert merged["a"].engagement is None
+
+        # An incremental listing moves the cursor but not the full-listing clock
+        store.record_listing(started + 30, full=False)
+        assert store.listing_since(ttl_hours=24) == iso(started + 30 - LISTING_SKEW_SECONDS)
+        store.set_meta("last_full_listing", str(time.time() - 25 * 3600))
+        assert store.listing_since(ttl_hours=24) is None
@@ -26,5 +26,5 @@ export LIST_GIST_ID="your-gist-id-here"      # Required for updating a gist
 export GIST_TOKEN="your-github-token-here"   # Required for updating a gist
 export TARGET_MD_FILENAME=Public-gists.md    # Optional - customize filename in the gist
 
-# Run the script
-uv run python make-gist-list.py
+# Run the script (uv installs the make-gist-list command into the project environment)
+uv run make-gist-list